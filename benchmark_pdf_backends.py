@@ -0,0 +1,82 @@
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from multi_doc_rag import DEFAULT_PDF_BACKENDS, FallbackPDFLoader
+
+# Compares PDF text extraction throughput (pages/sec) of the backends
+# FallbackPDFLoader can use, on the product sheets in my_documents by default.
+# Each backend runs alone (no fallback), so a missing package shows up as
+# unavailable instead of silently measuring PyPDF.
+
+
+def benchmark_backend(backend: str, pdf_paths: List[Path], repeat: int) -> Dict:
+    """Extract every PDF repeat times with one backend and time it"""
+    pages = chars = 0
+    started = time.perf_counter()
+
+    try:
+        for _ in range(repeat):
+            for path in pdf_paths:
+                for doc in FallbackPDFLoader(str(path), backends=(backend,)).lazy_load():
+                    pages += 1
+                    chars += len(doc.page_content)
+    except RuntimeError as e:
+        return {"backend": backend, "available": False, "error": str(e)}
+
+    elapsed = time.perf_counter() - started
+    return {
+        "backend": backend,
+        "available": True,
+        "pages": pages,
+        "chars_per_page": round(chars / pages, 1) if pages else 0,
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(pages / elapsed, 1) if elapsed else None,
+    }
+
+
+def print_report(results: List[Dict], files: int, repeat: int):
+    print("=" * 80)
+    print(f"PDF BACKENDS: {files} file(s) x {repeat} run(s)")
+    print("=" * 80)
+    print(f"  {'backend':10} {'pages':>7} {'seconds':>9} {'pages/sec':>10} {'chars/page':>11}")
+    for result in results:
+        if not result["available"]:
+            print(f"  {result['backend']:10} unavailable - {result['error']}")
+            continue
+        print(f"  {result['backend']:10} {result['pages']:>7} {result['seconds']:>9} "
+              f"{result['pages_per_sec']:>10} {result['chars_per_page']:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare PDF text extraction backends in pages/sec"
+    )
+    parser.add_argument("paths", nargs="*", default=["my_documents"],
+                        help="PDF files or directories to scan (default: my_documents)")
+    parser.add_argument("--backends", nargs="+", default=list(DEFAULT_PDF_BACKENDS),
+                        help="Backends to compare (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Times each file is extracted per backend")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    pdf_paths = []
+    for path in map(Path, args.paths):
+        if path.is_dir():
+            pdf_paths.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() == ".pdf"))
+        else:
+            pdf_paths.append(path)
+
+    if not pdf_paths:
+        parser.error("No PDF files found")
+
+    results = [benchmark_backend(backend, pdf_paths, args.repeat) for backend in args.backends]
+    print_report(results, len(pdf_paths), args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results saved to {args.output}")
@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+import langgraph_rm_proposal_v2 as v2
+from clients import set_client
+from context_packing import count_tokens
+from langgraph_rm_proposal_batch import arun_batch, run_batch
+from multi_doc_rag import MultiDocumentRAG
+
+PRODUCTS = ["Term Loan", "Revolving Credit Facility", "Project Financing", "Trade Financing"]
+
+NODES = [
+    "web_search",
+    "identify_loan_products",
+    "retrieve_product_info",
+    "combine_contexts",
+    "generate_analysis",
+    "save_results",
+]
+
+# Per-node metrics that count external calls (see call_counts.py)
+CALL_COUNTERS = (
+    "search_calls", "search_cache_hits", "embedding_calls", "embedding_cache_hits",
+    "chroma_queries", "bm25_queries", "llm_calls",
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Gemini chat model
+
+    Product classification prompts get a fixed product list (per numbered
+    company for batched prompts); everything else gets a canned proposal. Each call
+    sleeps for ``latency`` seconds and reports estimated token usage so the
+    graph's instrumentation sees realistic numbers.
+    """
+
+    latency: float = 0.05
+    analysis_chars: int = 4000
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark-chat"
+
+    def _respond(self, messages) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+
+        if "JSON object" in prompt:
+            companies = re.findall(r"### Company (\d+):", prompt)
+            content = json.dumps({
+                number: ["Term Loan", "Working Capital Loan"] for number in companies
+            })
+        elif "JSON schema" in prompt:
+            content = json.dumps({"products": ["Term Loan", "Working Capital Loan"]})
+        else:
+            paragraph = "The company shows stable cash flow and a clear financing need. "
+            content = "## EXECUTIVE SUMMARY\n" + paragraph * (self.analysis_chars // len(paragraph))
+
+        input_tokens, output_tokens = count_tokens(prompt), count_tokens(content)
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": self._llm_type},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+def fake_search_results(search_input, results_per_query: int = 30) -> List[Dict]:
+    """Canned Tavily-style results, deterministic per query"""
+    query = search_input["query"] if isinstance(search_input, dict) else str(search_input)
+    return [
+        {
+            "title": f"{query} - news item {i}",
+            "url": f"https://example.com/{abs(hash(query)) % 10000}/{i}",
+            "content": (
+                f"Report {i} on {query}: the group announced expansion plans, new "
+                f"contracts worth RM{i * 10} million and capital expenditure guidance "
+                f"for the coming year. "
+            ) * 3,
+            "score": round(1 - i / (results_per_query + 1), 4),
+        }
+        for i in range(results_per_query)
+    ]
+
+
+def build_corpus(directory: Path, documents: int, paragraphs: int) -> List[Path]:
+    """Write a synthetic eligibility-sheet corpus of plain text files"""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+
+    for i in range(documents):
+        product = PRODUCTS[i % len(PRODUCTS)]
+        lines = [f"{product} Eligibility Sheet {i}", ""]
+        for p in range(paragraphs):
+            lines.append(
+                f"Criterion {p} for {product}: applicants must have a minimum paid-up "
+                f"capital of RM{(p + 1) * 100}k, a DSCR above {1 + p / 10:.1f} and at "
+                f"least {p % 5 + 1} years of audited accounts (sheet {i})."
+            )
+        # One eligibility sheet per product (picked up by the product index),
+        # the rest are extra policy notes only reachable by vector search
+        slug = product.replace(" ", "_")
+        name = f"{slug}_Eligibility_Criteria" if i < len(PRODUCTS) else f"{slug}_Policy_Note_{i}"
+        path = directory / f"{name}.txt"
+        path.write_text("\n".join(lines), encoding="utf-8")
+        paths.append(path)
+
+    return paths
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, if the platform exposes it"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil is optional
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except (ImportError, AttributeError):
+            return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def benchmark_ingestion(rag: MultiDocumentRAG, corpus_dir: Path, workers: int) -> Dict:
+    """Ingest the synthetic corpus and measure chunks/sec"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vectorstore = rag.create_vectorstore(directory_path=str(corpus_dir), workers=workers)
+    elapsed = time.perf_counter() - start
+
+    chunks = vectorstore._collection.count()
+    return {
+        "documents": len(list(corpus_dir.iterdir())),
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(chunks / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def benchmark_proposals(
+    companies: int,
+    concurrency: int,
+    use_async: bool,
+    llm_batch_size: Optional[int] = None
+) -> Dict:
+    """Run the v2 graph for a synthetic portfolio and summarise node latencies"""
+    rows = [
+        {
+            "company_name": f"Benchmark Company {i:04d}",
+            "web_query": v2.default_web_query(f"Benchmark Company {i:04d}"),
+            "use_vectorstore": True,
+        }
+        for i in range(companies)
+    ]
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if use_async:
+            results = asyncio.run(arun_batch(rows, concurrency, llm_batch_size=llm_batch_size))
+        else:
+            results = run_batch(rows, concurrency, llm_batch_size=llm_batch_size)
+    elapsed = time.perf_counter() - start
+
+    # External calls per node, summed over companies (wall time is reported above)
+    node_calls = {}
+    for node in NODES:
+        totals = Counter()
+        for r in results:
+            totals.update({
+                key: value for key, value in r["metrics"].get(node, {}).items()
+                if key in CALL_COUNTERS
+            })
+        node_calls[node] = dict(totals)
+
+    node_latency = {}
+    for node in NODES:
+        times = [r["metrics"][node]["wall_time_s"] for r in results if node in r["metrics"]]
+        node_latency[node] = {
+            "p50_s": round(percentile(times, 50), 4),
+            "p95_s": round(percentile(times, 95), 4),
+        }
+
+    return {
+        "companies": companies,
+        "failed": sum(1 for r in results if r["status"] != "success"),
+        "loan_product_fallbacks": sum(
+            r["metrics"].get("identify_loan_products", {}).get("fallbacks", 0) for r in results
+        ),
+        "seconds": round(elapsed, 3),
+        "proposals_per_sec": round(companies / elapsed, 2) if elapsed else 0.0,
+        "node_latency": node_latency,
+        "node_calls": node_calls,
+    }
+
+
+def run_benchmark(
+    companies: int = 20,
+    documents: int = 8,
+    paragraphs: int = 40,
+    llm_latency: float = 0.05,
+    search_results: int = 30,
+    concurrency: int = 4,
+    use_async: bool = False,
+    workers: int = 1,
+    llm_batch_size: Optional[int] = None
+) -> Dict:
+    """
+    Benchmark ingestion and proposal generation with local stand-ins
+
+    Search, LLM and embeddings are replaced with deterministic fakes, so the
+    numbers reflect the pipeline's own overhead plus the configured LLM
+    latency, and no API quota is used.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        corpus_dir = workdir / "documents"
+        build_corpus(corpus_dir, documents, paragraphs)
+
+        rag = MultiDocumentRAG(
+            embed_model=DeterministicFakeEmbedding(size=768),
+            chroma_path=str(workdir / "chroma_db"),
+            cache_embeddings=False
+        )
+
+        set_client("search", RunnableLambda(lambda q: fake_search_results(q, search_results)))
+        set_client("llm_model", FakeChatModel(latency=llm_latency))
+        set_client("rag_system", rag)
+        v2.OUTPUT_DIR = str(workdir / "output")
+
+        ingestion = benchmark_ingestion(rag, corpus_dir, workers)
+        proposals = benchmark_proposals(companies, concurrency, use_async, llm_batch_size)
+
+    return {
+        "config": {
+            "companies": companies,
+            "documents": documents,
+            "paragraphs": paragraphs,
+            "llm_latency_s": llm_latency,
+            "search_results": search_results,
+            "concurrency": concurrency,
+            "async": use_async,
+            "workers": workers,
+            "llm_batch_size": llm_batch_size,
+        },
+        "ingestion": ingestion,
+        "proposals": proposals,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report: Dict):
+    """Print the benchmark results as a readable table"""
+    ingestion, proposals = report["ingestion"], report["proposals"]
+
+    print("="*80)
+    print("RM PROPOSAL PIPELINE BENCHMARK (offline)")
+    print("="*80)
+    print(f"Config: {report['config']}")
+    print(f"\n📚 Ingestion: {ingestion['documents']} documents, {ingestion['chunks']} chunks "
+          f"in {ingestion['seconds']:.2f}s ({ingestion['chunks_per_sec']:.1f} chunks/sec)")
+    print(f"🚀 Proposals: {proposals['companies']} companies ({proposals['failed']} failed) "
+          f"in {proposals['seconds']:.2f}s ({proposals['proposals_per_sec']:.2f} proposals/sec)")
+    print(f"⚠️  Loan product fallbacks: {proposals['loan_product_fallbacks']}")
+
+    print(f"\n{'Node':<25}{'p50 (s)':>10}{'p95 (s)':>10}")
+    for node, latency in proposals["node_latency"].items():
+        print(f"{node:<25}{latency['p50_s']:>10.4f}{latency['p95_s']:>10.4f}")
+
+    print(f"\n{'Node':<25}Calls (all companies)")
+    for node, calls in proposals["node_calls"].items():
+        summary = ", ".join(f"{key}={value:g}" for key, value in sorted(calls.items()))
+        print(f"{node:<25}{summary or '-'}")
+
+    if report["peak_rss_mb"] is not None:
+        print(f"\n💾 Peak RSS: {report['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the RM proposal pipeline offline with fake search, LLM and embeddings"
+    )
+    parser.add_argument("--companies", type=int, default=20,
+                        help="Number of synthetic companies (default: 20)")
+    parser.add_argument("--documents", type=int, default=8,
+                        help="Number of synthetic eligibility sheets (default: 8)")
+    parser.add_argument("--paragraphs", type=int, default=40,
+                        help="Criteria paragraphs per sheet (default: 40)")
+    parser.add_argument("--llm-latency", type=float, default=0.05,
+                        help="Seconds each fake LLM call sleeps (default: 0.05)")
+    parser.add_argument("--search-results", type=int, default=30,
+                        help="Canned results per web search (default: 30)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Companies processed at once (default: 4)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Use the async batch runner")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Document loading processes during ingestion (default: 1)")
+    parser.add_argument("--llm-batch-size", type=int,
+                        help="Classify loan products for this many companies per LLM request")
+    parser.add_argument("--output", help="Optional JSON file for the report")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        companies=args.companies,
+        documents=args.documents,
+        paragraphs=args.paragraphs,
+        llm_latency=args.llm_latency,
+        search_results=args.search_results,
+        concurrency=args.concurrency,
+        use_async=args.use_async,
+        workers=args.workers,
+        llm_batch_size=args.llm_batch_size
+    )
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Benchmark report saved to {args.output}")
@@ -0,0 +1,236 @@
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Chunk metadata stored with each chunk so Chroma-style where filters can be
+# applied inside the index (see where_sql)
+FILTER_FIELDS = ("source", "file_type", "document_type", "product_family", "effective_date")
+
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# Common words that carry no signal for product and criterion lookups
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to "
+    "was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric terms, without stopwords"""
+    return [term for term in re.findall(r"[a-z0-9]+", text.lower()) if term not in STOPWORDS]
+
+
+def where_sql(where: dict) -> Tuple[str, list]:
+    """
+    SQL condition on the chunks table (alias c) for a Chroma where filter.
+
+    Supports $and/$or and $eq, $ne, $gt, $gte, $lt, $lte, $in and $nin on
+    FILTER_FIELDS; raises ValueError for anything else.
+    """
+    conditions, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_sql(sub) for sub in condition]
+            conditions.append("(" + (" AND " if key == "$and" else " OR ").join(sql for sql, _ in parts) + ")")
+            params.extend(param for _, sub_params in parts for param in sub_params)
+            continue
+
+        if key not in FILTER_FIELDS:
+            raise ValueError(f"BM25 index cannot filter on {key!r}")
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                values = list(value)
+                if not values:
+                    conditions.append("0" if operator == "$in" else "1")
+                    continue
+                negate = "NOT " if operator == "$nin" else ""
+                conditions.append(f"c.{key} {negate}IN ({','.join('?' * len(values))})")
+                params.extend(values)
+            elif operator in _COMPARISONS:
+                conditions.append(f"c.{key} {_COMPARISONS[operator]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"BM25 index does not support the {operator} operator")
+
+    return " AND ".join(conditions) or "1", params
+
+
+class BM25Index:
+    """
+    On-disk inverted index with Okapi BM25 ranking, stored in SQLite.
+
+    Kept next to the Chroma collection and updated with the same chunk IDs,
+    so exact terms such as product names, "DSCR" or "paid-up capital" can be
+    matched lexically and fused with the vector search results. Adding an ID
+    that is already indexed is a no-op, so re-running an interrupted
+    ingestion never double counts a chunk.
+
+    Each chunk also keeps its FILTER_FIELDS metadata, so searches filtered
+    by product or date only score matching chunks without asking Chroma for
+    their IDs. An index file from an older schema is not touched and only
+    flagged with needs_rebuild; it must be rebuilt before use.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.needs_rebuild = False
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION and self._conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'chunks'"
+        ).fetchone()[0]:
+            # Left as it is for the owner to rebuild into a new file
+            self.needs_rebuild = True
+            return
+
+        columns = "".join(f", {field} TEXT" for field in FILTER_FIELDS)
+        indexes = "".join(
+            f"CREATE INDEX IF NOT EXISTS chunks_{field} ON chunks ({field});" for field in FILTER_FIELDS
+        )
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, length INTEGER NOT NULL{columns});
+            {indexes}
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);
+            PRAGMA user_version = {self.SCHEMA_VERSION};
+            """
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM chunks")]
+
+    def add(self, ids: List[str], texts: List[str], metadatas: Optional[List[dict]] = None) -> int:
+        """Index chunks not indexed yet; returns how many were added"""
+        if metadatas is None:
+            metadatas = [{}] * len(ids)
+        with self._lock:
+            known = set()
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                known.update(
+                    row[0] for row in self._conn.execute(
+                        f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                    )
+                )
+
+            chunks, postings = [], []
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                if chunk_id in known:
+                    continue
+                known.add(chunk_id)
+                terms = tokenize(text)
+                metadata = metadata or {}
+                chunks.append(
+                    (chunk_id, len(terms)) + tuple(metadata.get(field) for field in FILTER_FIELDS)
+                )
+                postings.extend((term, chunk_id, tf) for term, tf in Counter(terms).items())
+
+            self._conn.executemany(
+                f"INSERT INTO chunks (id, length, {', '.join(FILTER_FIELDS)}) "
+                f"VALUES (?, ?{', ?' * len(FILTER_FIELDS)})",
+                chunks
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", postings
+            )
+            self._conn.commit()
+            return len(chunks)
+
+    def delete(self, ids: Iterable[str]):
+        ids = list(ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+            self._conn.commit()
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        where: Optional[dict] = None,
+        ids: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top k (chunk ID, BM25 score) pairs for a query.
+
+        where is a Chroma-style metadata filter (see where_sql); the matching
+        chunks are then the corpus the scores are computed over. ids limits
+        the results to a set of chunk IDs, for filters where_sql cannot express.
+        """
+        return self.search_many([query], k, where, ids)[0]
+
+    def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        where: Optional[dict] = None,
+        ids: Optional[Set[str]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """search() for several queries, sharing the corpus statistics"""
+        condition, params = where_sql(where) if where else ("1", [])
+
+        with self._lock:
+            count, total_length = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks c WHERE {condition}", params
+            ).fetchone()
+            if not count:
+                return [[] for _ in queries]
+            average_length = total_length / count or 1.0
+
+            postings_cache: Dict[str, list] = {}
+            results = []
+            for query in queries:
+                scores = Counter()
+                for term in set(tokenize(query)):
+                    if term not in postings_cache:
+                        postings_cache[term] = self._conn.execute(
+                            "SELECT p.chunk_id, p.tf, c.length FROM postings p "
+                            f"JOIN chunks c ON c.id = p.chunk_id WHERE p.term = ? AND {condition}",
+                            [term] + params
+                        ).fetchall()
+                    postings = postings_cache[term]
+                    if not postings:
+                        continue
+
+                    df = len(postings)
+                    idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                    for chunk_id, tf, length in postings:
+                        if ids is not None and chunk_id not in ids:
+                            continue
+                        norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                        scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+                results.append(scores.most_common(k))
+            return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,35 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Counts of external calls made inside a collect_calls() block. The clients
+# count where a call actually happens (CachedSearch, CachedEmbeddings,
+# MultiDocumentRAG), so cache hits are reported apart from API calls and
+# concurrent runs (threads or asyncio tasks) each see only their own calls.
+_active: ContextVar[Optional[Counter]] = ContextVar("call_counts", default=None)
+
+
+def count_call(name: str, amount: int = 1):
+    """Add amount to the name counter of the active collect_calls() block, if any"""
+    counts = _active.get()
+    if counts is not None and amount:
+        counts[name] += amount
+
+
+@contextmanager
+def collect_calls() -> Iterator[Counter]:
+    """
+    Count the calls made in this block (and threads started with its context)
+
+    Counts also go to an enclosing block when the block ends.
+    """
+    parent = _active.get()
+    counts = Counter()
+    token = _active.set(counts)
+    try:
+        yield counts
+    finally:
+        _active.reset(token)
+        if parent is not None:
+            parent.update(counts)
@@ -0,0 +1,116 @@
+import os
+import threading
+from typing import Callable, Dict
+
+# API clients shared by the proposal scripts. Each is created on first use by
+# its factory, so importing a script does not build Tavily/Gemini clients or
+# open the vector store; use set_client() to inject stand-ins (e.g. in tests
+# or benchmarks). API calls go through per-provider rate limiters with
+# retry/backoff (see rate_limit.py); set
+# RATE_LIMIT_<TAVILY|GEMINI|GEMINI_EMBEDDINGS>_<RPM|TPM> to match your quota.
+
+DEFAULT_CHROMA_PATH = "./my_documents_db"
+
+
+def create_search():
+    """Tavily search behind the on-disk cache and the "tavily" rate limiter"""
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
+    from rate_limit import raise_error_result, rate_limited
+    from search_cache import CachedSearch
+
+    # Search results are cached on disk so repeated companies skip the API;
+    # set SEARCH_CACHE_OFFLINE=1 to replay cached runs without network access.
+    # The tool returns API errors as strings, which are raised so that quota
+    # errors are retried.
+    return CachedSearch(
+        rate_limited(
+            # TavilySearchResults has no time range option (a time_range
+            # argument is silently dropped); the queries name the years instead
+            TavilySearchResults(max_results=30),
+            "tavily",
+            check_result=raise_error_result
+        ),
+        offline=os.getenv("SEARCH_CACHE_OFFLINE") == "1",
+    )
+
+
+def create_llm_model():
+    """Gemini chat model behind the "gemini" rate limiter"""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    from rate_limit import rate_limited
+
+    return rate_limited(ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0), "gemini")
+
+
+def create_embed_model():
+    """Gemini embedding model (rate limited inside MultiDocumentRAG)"""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+
+
+def create_rag_system(chroma_path: str = DEFAULT_CHROMA_PATH, embed_model=None):
+    """MultiDocumentRAG over the internal documents vector store"""
+    from multi_doc_rag import MultiDocumentRAG
+    from rate_limit import get_rate_limiter
+
+    return MultiDocumentRAG(
+        embed_model=embed_model or get_embed_model(),
+        chroma_path=chroma_path,
+        chunk_size=500,
+        chunk_overlap=50,
+        rate_limiter=get_rate_limiter("gemini_embeddings")
+    )
+
+
+_FACTORIES: Dict[str, Callable] = {
+    "search": create_search,
+    "llm_model": create_llm_model,
+    "embed_model": create_embed_model,
+    "rag_system": create_rag_system,
+}
+
+_clients = {}
+# Re-entrant: the rag_system factory asks for the embed_model
+_clients_lock = threading.RLock()
+
+
+def get_client(name: str):
+    """Shared client by name, created by its factory on first use"""
+    if name not in _FACTORIES:
+        raise KeyError(f"Unknown client: {name}. Clients: {list(_FACTORIES)}")
+
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = _FACTORIES[name]()
+        return _clients[name]
+
+
+def set_client(name: str, client):
+    """Use client instead of the factory-built one (None goes back to the factory)"""
+    if name not in _FACTORIES:
+        raise KeyError(f"Unknown client: {name}. Clients: {list(_FACTORIES)}")
+
+    with _clients_lock:
+        if client is None:
+            _clients.pop(name, None)
+        else:
+            _clients[name] = client
+
+
+def get_search():
+    return get_client("search")
+
+
+def get_llm_model():
+    return get_client("llm_model")
+
+
+def get_embed_model():
+    return get_client("embed_model")
+
+
+def get_rag_system():
+    return get_client("rag_system")
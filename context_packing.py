@@ -0,0 +1,85 @@
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """
+    The tiktoken encoding, loaded on first use (None if unavailable)
+
+    Optional dependency: tiktoken gives real token counts. Its first use
+    downloads the BPE file, so it is not loaded at import time, and any
+    failure (not installed, offline worker) falls back to the usual ~4
+    characters per token estimate.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count (or estimate) the number of tokens in a text"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    """Word n-grams used to spot near-identical snippets"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_blocks(
+    blocks: List[Tuple[str, Optional[float]]],
+    budget_tokens: int,
+    duplicate_threshold: float = 0.8
+) -> Tuple[List[int], int]:
+    """
+    Choose which context blocks fit into a token budget
+
+    Blocks are (text, relevance score) pairs; higher scores win, and blocks
+    without a score keep their original order after the scored ones.
+    Near-duplicates of an already chosen block (word-shingle Jaccard
+    similarity >= duplicate_threshold) are dropped, and blocks that do not
+    fit are skipped so smaller ones further down can still use the space.
+
+    Returns the indices of the chosen blocks in rank order, and the tokens used.
+    """
+    ranked = sorted(
+        range(len(blocks)),
+        key=lambda i: (blocks[i][1] is None, -(blocks[i][1] or 0.0), i)
+    )
+
+    chosen, chosen_shingles = [], []
+    used_tokens = 0
+
+    for i in ranked:
+        text = blocks[i][0]
+        tokens = count_tokens(text)
+        if used_tokens + tokens > budget_tokens:
+            continue
+
+        shingles = _shingles(text)
+        if any(_jaccard(shingles, other) >= duplicate_threshold for other in chosen_shingles):
+            continue
+
+        chosen.append(i)
+        chosen_shingles.append(shingles)
+        used_tokens += tokens
+
+    return chosen, used_tokens
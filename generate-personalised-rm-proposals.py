@@ -1,33 +1,15 @@
 import os
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-import pandas as pd
 from dotenv import load_dotenv
 
-from multi_doc_rag import MultiDocumentRAG
+from clients import get_llm_model, get_rag_system, get_search
 
 # Set API keys
 load_dotenv()
 
-# Initialize components
-search = TavilySearchResults(
-    max_results=30,
-    time_range="year",
-)
-
-llm_model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0)
-
-embed_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-
-# Initialize RAG system
-rag_system = MultiDocumentRAG(
-    embed_model=embed_model,
-    chroma_path="./my_documents_db",
-    chunk_size=500,
-    chunk_overlap=50
-)
+# Search, LLM and RAG clients are created on first use (see clients.py);
+# inject stand-ins with clients.set_client()
 
 
 def create_hybrid_rm_proposal_analysis(
@@ -48,7 +30,7 @@ def create_hybrid_rm_proposal_analysis(
     
     # Step 1: Web Search (Tavily)
     print(f"🔍 [WEB SEARCH] Searching for: {company_name}...")
-    web_results = search.invoke({"query": web_query})
+    web_results = get_search().invoke({"query": web_query})
     
     # Format web search results
     web_context_parts = []
@@ -75,7 +57,7 @@ def create_hybrid_rm_proposal_analysis(
             search_query = internal_query if internal_query else web_query
             
             # Get retriever and search
-            retriever = rag_system.get_retriever(search_kwargs={"k": 5})
+            retriever = get_rag_system().get_retriever(search_kwargs={"k": 5})
             internal_docs = retriever.invoke(search_query)
             
             # Format internal document results
@@ -154,7 +136,7 @@ def create_hybrid_rm_proposal_analysis(
     ])
     
     # Step 5: Generate analysis
-    chain = prompt | llm_model | StrOutputParser()
+    chain = prompt | get_llm_model() | StrOutputParser()
     
     print("🤖 Generating hybrid analysis...\n")
     analysis = chain.invoke({
@@ -203,7 +185,7 @@ if __name__ == "__main__":
     print("="*80)
     print("INITIAL SETUP: Loading Internal Documents")
     print("="*80)
-    rag_system.create_vectorstore(directory_path="./my_documents")
+    get_rag_system().create_vectorstore(directory_path="./my_documents")
     print("\n")
     """
     
@@ -0,0 +1,419 @@
+import argparse
+import asyncio
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langgraph_rm_proposal_v2 import (
+    DEFAULT_CHECKPOINT_DB,
+    acheckpoint_action,
+    aidentify_loan_products_batch,
+    arun_with_checkpoint,
+    aweb_search_node,
+    build_initial_state,
+    checkpoint_action,
+    checkpoint_config,
+    create_rm_proposal_graph,
+    create_sqlite_checkpointer,
+    default_web_query,
+    emit_run_metrics,
+    identify_loan_products_batch,
+    instrument_node,
+    run_with_checkpoint,
+    web_search_node,
+)
+
+
+def _parse_bool(value, default: bool = True) -> bool:
+    """Parse a y/n style flag from a CSV cell or JSON value"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("n", "no", "false", "0")
+
+
+def load_companies(path: str) -> List[Dict]:
+    """
+    Load the company list for a batch run from a CSV or JSONL file
+
+    Each row needs a company name (``company_name`` or ``name``) and may set
+    ``web_query`` (defaults to the auto-generated query) and
+    ``use_vectorstore`` (y/n, defaults to y).
+    """
+    file_path = Path(path)
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"Company list not found: {file_path}")
+
+    if file_path.suffix.lower() == ".csv":
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    elif file_path.suffix.lower() in (".jsonl", ".json"):
+        with open(file_path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        raise ValueError(
+            f"Unsupported company list type: {file_path.suffix}. "
+            "Supported types: ['.csv', '.jsonl']"
+        )
+
+    companies = []
+    for row in rows:
+        company_name = (row.get("company_name") or row.get("name") or "").strip()
+        if not company_name:
+            print(f"⚠️ Skipping row without company name: {row}")
+            continue
+
+        companies.append({
+            "company_name": company_name,
+            "web_query": (row.get("web_query") or "").strip() or default_web_query(company_name),
+            "use_vectorstore": _parse_bool(row.get("use_vectorstore")),
+        })
+
+    return companies
+
+
+def _company_result(company: Dict, final_state: Dict, error: str, start: float) -> Dict:
+    """Summarise the outcome of one company run"""
+    error = error or final_state.get("error", "")
+    return {
+        "company_name": company["company_name"],
+        "status": "failed" if error else "success",
+        "error": error,
+        "suggested_loan_products": final_state.get("suggested_loan_products", []),
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+        "metrics": final_state.get("metrics", {}),
+    }
+
+
+def _initial_state(company: Dict) -> Dict:
+    return build_initial_state(
+        company["company_name"],
+        company["web_query"],
+        company["use_vectorstore"]
+    )
+
+
+def _run_company(
+    app,
+    company: Dict,
+    run_id: Optional[str],
+    metrics_path: Optional[str],
+    initial_state: Optional[Dict] = None
+) -> Dict:
+    """Run the compiled graph for one company (resuming it if checkpointed)"""
+    start = time.perf_counter()
+    if initial_state is None:
+        initial_state = _initial_state(company)
+
+    try:
+        if run_id is None:
+            final_state = app.invoke(initial_state)
+        else:
+            final_state = run_with_checkpoint(
+                app, initial_state, checkpoint_config(company["company_name"], run_id)
+            )
+        if metrics_path:
+            emit_run_metrics(final_state, metrics_path)
+        return _company_result(company, final_state, "", start)
+    except Exception as e:
+        return _company_result(company, {}, f"Workflow failed: {str(e)}", start)
+
+
+async def _arun_company(
+    app,
+    company: Dict,
+    semaphore: asyncio.Semaphore,
+    run_id: Optional[str],
+    metrics_path: Optional[str],
+    initial_state: Optional[Dict] = None
+) -> Dict:
+    """Run the async compiled graph for one company (resuming it if checkpointed)"""
+    async with semaphore:
+        start = time.perf_counter()
+        if initial_state is None:
+            initial_state = _initial_state(company)
+
+        try:
+            if run_id is None:
+                final_state = await app.ainvoke(initial_state)
+            else:
+                final_state = await arun_with_checkpoint(
+                    app, initial_state, checkpoint_config(company["company_name"], run_id)
+                )
+            if metrics_path:
+                await asyncio.to_thread(emit_run_metrics, final_state, metrics_path)
+            return _company_result(company, final_state, "", start)
+        except Exception as e:
+            return _company_result(company, {}, f"Workflow failed: {str(e)}", start)
+
+
+def _prepare_batch(
+    app,
+    companies: List[Dict],
+    run_id: Optional[str],
+    executor: ThreadPoolExecutor,
+    llm_batch_size: int
+) -> List[Optional[Dict]]:
+    """
+    Web search every company, then classify them with batched LLM calls
+
+    Both phases run on the executor, so at most max_concurrency searches or
+    classification requests are in flight.
+
+    Returns the prepared state per company (None for companies whose
+    checkpoint is already finished or resumable), ready for a graph that
+    starts at retrieve_product_info.
+    """
+    pending = [
+        i for i, company in enumerate(companies)
+        if run_id is None
+        or checkpoint_action(app, checkpoint_config(company["company_name"], run_id)) == "start"
+    ]
+
+    web_search = instrument_node("web_search", web_search_node)
+    searched = list(executor.map(lambda i: web_search(_initial_state(companies[i])), pending))
+
+    prepared = [None] * len(companies)
+    classified = identify_loan_products_batch(searched, llm_batch_size, executor=executor)
+    for i, state in zip(pending, classified):
+        prepared[i] = state
+    return prepared
+
+
+async def _aprepare_batch(
+    app,
+    companies: List[Dict],
+    run_id: Optional[str],
+    semaphore: asyncio.Semaphore,
+    llm_batch_size: int
+) -> List[Optional[Dict]]:
+    """Async version of ``_prepare_batch``"""
+    pending = [
+        i for i, company in enumerate(companies)
+        if run_id is None
+        or await acheckpoint_action(app, checkpoint_config(company["company_name"], run_id)) == "start"
+    ]
+
+    web_search = instrument_node("web_search", aweb_search_node)
+
+    async def search(i):
+        async with semaphore:
+            return await web_search(_initial_state(companies[i]))
+
+    searched = await asyncio.gather(*(search(i) for i in pending))
+
+    prepared = [None] * len(companies)
+    classified = await aidentify_loan_products_batch(searched, llm_batch_size, semaphore=semaphore)
+    for i, state in zip(pending, classified):
+        prepared[i] = state
+    return prepared
+
+
+def _print_progress(result: Dict, done: int, total: int):
+    """Print one line per finished company"""
+    status = "✅" if result["status"] == "success" else "❌"
+    print(f"{status} [{done}/{total}] {result['company_name']} "
+          f"({result['elapsed_seconds']:.1f}s) {result['error']}")
+
+
+def _print_summary(results: List[Dict], total_seconds: float):
+    """Print success/failure counts and wall time for the batch"""
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    fallbacks = sum(
+        r["metrics"].get("identify_loan_products", {}).get("fallbacks", 0) for r in results
+    )
+
+    print("\n" + "="*80)
+    print("BATCH SUMMARY")
+    print("="*80)
+    print(f"✓ Succeeded: {succeeded}")
+    print(f"✗ Failed: {len(results) - succeeded}")
+    print(f"⚠️  Default loan products used: {fallbacks}")
+    print(f"⏱️  Total wall time: {total_seconds:.1f}s")
+    if results:
+        print(f"⏱️  Throughput: {len(results) / total_seconds * 60:.1f} companies/min")
+
+
+def run_batch(
+    companies: List[Dict],
+    max_concurrency: int = 4,
+    run_id: Optional[str] = None,
+    checkpoint_db: str = DEFAULT_CHECKPOINT_DB,
+    metrics_path: Optional[str] = None,
+    llm_batch_size: Optional[int] = None
+) -> List[Dict]:
+    """
+    Generate RM proposals for many companies concurrently
+
+    One compiled graph is shared by all workers, so the search client, LLM
+    client and ``MultiDocumentRAG`` from ``langgraph_rm_proposal_v2`` are set
+    up once per process instead of once per company.
+
+    Args:
+        companies: Rows as returned by ``load_companies``
+        max_concurrency: Maximum number of companies in flight at once
+        run_id: Enables checkpointing; re-running with the same run ID skips
+            finished companies and resumes failed ones from their last
+            completed node
+        checkpoint_db: SQLite file for the checkpoints
+        metrics_path: Optional JSONL file; one line of per-node metrics is
+            appended per company
+        llm_batch_size: Run in phases instead: web search for every company,
+            then loan product classification with one LLM request per
+            llm_batch_size companies, then the rest of the graph
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if llm_batch_size is not None and llm_batch_size < 1:
+        raise ValueError("llm_batch_size must be at least 1")
+
+    checkpointer = create_sqlite_checkpointer(checkpoint_db) if run_id else None
+    app = create_rm_proposal_graph(
+        checkpointer=checkpointer,
+        entry_point="web_search" if llm_batch_size is None else "retrieve_product_info"
+    )
+    results = []
+
+    print("="*80)
+    print(f"🚀 STARTING BATCH RM ELIGIBILITY ANALYSIS: {len(companies)} companies "
+          f"(concurrency={max_concurrency})")
+    print("="*80 + "\n")
+
+    batch_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        prepared = [None] * len(companies)
+        if llm_batch_size is not None:
+            prepared = _prepare_batch(app, companies, run_id, executor, llm_batch_size)
+
+        futures = [
+            executor.submit(_run_company, app, company, run_id, metrics_path, state)
+            for company, state in zip(companies, prepared)
+        ]
+
+        for future in as_completed(futures):
+            results.append(future.result())
+            _print_progress(results[-1], len(results), len(companies))
+
+    _print_summary(results, time.perf_counter() - batch_start)
+    return results
+
+
+async def arun_batch(
+    companies: List[Dict],
+    max_concurrency: int = 50,
+    run_id: Optional[str] = None,
+    checkpoint_db: str = DEFAULT_CHECKPOINT_DB,
+    metrics_path: Optional[str] = None,
+    llm_batch_size: Optional[int] = None
+) -> List[Dict]:
+    """
+    Generate RM proposals for many companies on a single event loop
+
+    Uses the async node variants, so concurrency is bounded by
+    ``max_concurrency`` rather than by a thread pool. ``run_id``,
+    ``checkpoint_db``, ``metrics_path`` and ``llm_batch_size`` work as in
+    ``run_batch``.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if llm_batch_size is not None and llm_batch_size < 1:
+        raise ValueError("llm_batch_size must be at least 1")
+
+    if run_id is None:
+        return await _arun_batch(
+            companies, max_concurrency, None, None, metrics_path, llm_batch_size
+        )
+
+    # Optional dependency: pip install langgraph-checkpoint-sqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    async with AsyncSqliteSaver.from_conn_string(checkpoint_db) as checkpointer:
+        return await _arun_batch(
+            companies, max_concurrency, run_id, checkpointer, metrics_path, llm_batch_size
+        )
+
+
+async def _arun_batch(
+    companies: List[Dict],
+    max_concurrency: int,
+    run_id: Optional[str],
+    checkpointer,
+    metrics_path: Optional[str],
+    llm_batch_size: Optional[int]
+) -> List[Dict]:
+    app = create_rm_proposal_graph(
+        async_nodes=True,
+        checkpointer=checkpointer,
+        entry_point="web_search" if llm_batch_size is None else "retrieve_product_info"
+    )
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = []
+
+    print("="*80)
+    print(f"🚀 STARTING ASYNC BATCH RM ELIGIBILITY ANALYSIS: {len(companies)} companies "
+          f"(concurrency={max_concurrency})")
+    print("="*80 + "\n")
+
+    batch_start = time.perf_counter()
+
+    prepared = [None] * len(companies)
+    if llm_batch_size is not None:
+        prepared = await _aprepare_batch(app, companies, run_id, semaphore, llm_batch_size)
+
+    tasks = [
+        _arun_company(app, company, semaphore, run_id, metrics_path, state)
+        for company, state in zip(companies, prepared)
+    ]
+    for task in asyncio.as_completed(tasks):
+        results.append(await task)
+        _print_progress(results[-1], len(results), len(companies))
+
+    _print_summary(results, time.perf_counter() - batch_start)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate RM eligibility proposals for a portfolio of companies"
+    )
+    parser.add_argument("companies", help="CSV or JSONL file with the companies to analyse")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Number of companies processed at once (default: 4)")
+    parser.add_argument("--report", help="Optional JSONL file for per-company results")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run all companies on one event loop with the async nodes")
+    parser.add_argument("--run-id",
+                        help="Checkpoint every node under this run ID; re-running with the "
+                             "same ID resumes each company from its last completed node")
+    parser.add_argument("--checkpoint-db", default=DEFAULT_CHECKPOINT_DB,
+                        help=f"SQLite file for checkpoints (default: {DEFAULT_CHECKPOINT_DB})")
+    parser.add_argument("--llm-batch-size", type=int,
+                        help="Classify loan products for this many companies per LLM request "
+                             "(web search runs for all companies first)")
+    parser.add_argument("--metrics",
+                        help="Optional JSONL file for per-node latency, call and token metrics")
+    args = parser.parse_args()
+
+    companies = load_companies(args.companies)
+    if args.use_async:
+        results = asyncio.run(arun_batch(
+            companies, args.concurrency, args.run_id, args.checkpoint_db, args.metrics,
+            args.llm_batch_size
+        ))
+    else:
+        results = run_batch(
+            companies, args.concurrency, args.run_id, args.checkpoint_db, args.metrics,
+            args.llm_batch_size
+        )
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+        print(f"📄 Batch report saved to {args.report}")
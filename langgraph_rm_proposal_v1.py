@@ -1,34 +1,19 @@
 import os
-from typing import TypedDict, Annotated, Sequence
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+import time
+from typing import TypedDict, Annotated, Sequence, Dict
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 import operator
 from dotenv import load_dotenv
 
-from multi_doc_rag import MultiDocumentRAG
+from clients import get_llm_model, get_rag_system, get_search
 
 # Set API keys
 load_dotenv()
 
-# Initialize components
-search = TavilySearchResults(
-    max_results=30,
-    time_range="year",
-)
-
-llm_model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0)
-embed_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-
-# Initialize RAG system
-rag_system = MultiDocumentRAG(
-    embed_model=embed_model,
-    chroma_path="./my_documents_db",
-    chunk_size=500,
-    chunk_overlap=50
-)
+# Search, LLM and RAG clients are created on first use (see clients.py);
+# inject stand-ins with clients.set_client()
 
 
 # Define the state
@@ -49,15 +34,19 @@ class RMProposalState(TypedDict):
     # Final output
     analysis: str
     error: str
+    
+    # Seconds spent in each node; merged across the parallel branches
+    timings: Annotated[Dict[str, float], operator.or_]
 
 
 # Node 1: Web Search
 def web_search_node(state: RMProposalState) -> RMProposalState:
     """Perform web search using Tavily"""
     print(f"🔍 [WEB SEARCH] Searching for: {state['company_name']}...")
+    start = time.perf_counter()
     
     try:
-        web_results = search.invoke({"query": state['web_query']})
+        web_results = get_search().invoke({"query": state['web_query']})
         
         # Format web search results
         web_context_parts = []
@@ -74,20 +63,21 @@ def web_search_node(state: RMProposalState) -> RMProposalState:
         
         print(f"✓ Found {len(web_results)} web sources")
         
+        # Runs in parallel with internal_search, so only return this branch's keys
         return {
-            **state,
             "web_results": web_results,
             "web_context": web_context,
-            "error": ""
+            "error": "",
+            "timings": {"web_search": time.perf_counter() - start}
         }
     
     except Exception as e:
         print(f"⚠️ Web search error: {e}")
         return {
-            **state,
             "web_results": [],
             "web_context": "",
-            "error": f"Web search failed: {str(e)}"
+            "error": f"Web search failed: {str(e)}",
+            "timings": {"web_search": time.perf_counter() - start}
         }
 
 
@@ -98,19 +88,20 @@ def internal_search_node(state: RMProposalState) -> RMProposalState:
     if not state['use_vectorstore']:
         print("⏭️  [INTERNAL DOCS] Skipping vectorstore search (disabled)")
         return {
-            **state,
             "internal_docs": [],
-            "internal_context": ""
+            "internal_context": "",
+            "timings": {"internal_search": 0.0}
         }
     
     print(f"📚 [INTERNAL DOCS] Searching vectorstore...")
+    start = time.perf_counter()
     
     try:
         # Use internal_query if provided, otherwise use web_query
         search_query = state['internal_query'] if state['internal_query'] else state['web_query']
         
         # Get retriever and search
-        retriever = rag_system.get_retriever(search_kwargs={"k": 5})
+        retriever = get_rag_system().get_retriever(search_kwargs={"k": 5})
         internal_docs = retriever.invoke(search_query)
         
         # Format internal document results
@@ -125,19 +116,20 @@ def internal_search_node(state: RMProposalState) -> RMProposalState:
         internal_context = "\n\n".join(internal_context_parts)
         print(f"✓ Found {len(internal_docs)} relevant internal documents")
         
+        # Runs in parallel with web_search, so only return this branch's keys
         return {
-            **state,
             "internal_docs": internal_docs,
-            "internal_context": internal_context
+            "internal_context": internal_context,
+            "timings": {"internal_search": time.perf_counter() - start}
         }
     
     except Exception as e:
         print(f"⚠️ Could not access vectorstore: {e}")
         print("   Continuing with web search only...")
         return {
-            **state,
             "internal_docs": [],
-            "internal_context": ""
+            "internal_context": "",
+            "timings": {"internal_search": time.perf_counter() - start}
         }
 
 
@@ -219,7 +211,7 @@ def generate_analysis_node(state: RMProposalState) -> RMProposalState:
         Please provide a comprehensive RM proposal analysis.""")
     ])
     
-    chain = prompt | llm_model | StrOutputParser()
+    chain = prompt | get_llm_model() | StrOutputParser()
     
     try:
         analysis = chain.invoke({
@@ -306,10 +298,11 @@ def create_rm_proposal_graph():
     workflow.add_node("generate_analysis", generate_analysis_node)
     workflow.add_node("save_results", save_results_node)
     
-    # Define the flow
-    workflow.set_entry_point("web_search")
-    workflow.add_edge("web_search", "internal_search")
-    workflow.add_edge("internal_search", "combine_contexts")
+    # Define the flow: web and internal search are independent, so fan out
+    # from START and join at combine_contexts once both branches finish
+    workflow.add_edge(START, "web_search")
+    workflow.add_edge(START, "internal_search")
+    workflow.add_edge(["web_search", "internal_search"], "combine_contexts")
     workflow.add_edge("combine_contexts", "generate_analysis")
     workflow.add_edge("generate_analysis", "save_results")
     workflow.add_edge("save_results", END)
@@ -349,7 +342,8 @@ def create_hybrid_rm_proposal_analysis(
         "internal_context": "",
         "combined_context": "",
         "analysis": "",
-        "error": ""
+        "error": "",
+        "timings": {}
     }
     
     # Run the workflow
@@ -359,6 +353,11 @@ def create_hybrid_rm_proposal_analysis(
     
     final_state = app.invoke(initial_state)
     
+    timings = final_state['timings']
+    print("\n⏱️  Branch timings: " + " | ".join(
+        f"{name}: {seconds:.2f}s" for name, seconds in timings.items()
+    ))
+    
     return final_state['analysis'], final_state['web_results'], final_state['internal_docs']
 
 
@@ -371,7 +370,7 @@ if __name__ == "__main__":
     print("="*80)
     print("INITIAL SETUP: Loading Internal Documents")
     print("="*80)
-    rag_system.create_vectorstore(directory_path="./my_documents")
+    get_rag_system().create_vectorstore(directory_path="./my_documents")
     print("\n")
     """
     
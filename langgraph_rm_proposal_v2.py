@@ -1,34 +1,42 @@
 import os
-from typing import TypedDict, List, Dict
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+import time
+import asyncio
+import inspect
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from enum import Enum
+from functools import wraps
+from concurrent.futures import Executor
+from typing import TypedDict, List, Dict, Optional
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser, JsonOutputParser
+from langchain_core.exceptions import OutputParserException
+from langchain_core.callbacks import get_usage_metadata_callback
 from langgraph.graph import StateGraph, END
 from dotenv import load_dotenv
+from pydantic import BaseModel, Field, ValidationError, field_validator
 import json
 
-from multi_doc_rag import MultiDocumentRAG
+from call_counts import collect_calls, count_call
+from clients import get_llm_model, get_rag_system, get_search
+from context_packing import pack_blocks, count_tokens
+from product_index import SHEET_DOCUMENT_TYPES
+from search_cache import CachedSearch
 
 # Set API keys
 load_dotenv()
 
-# Initialize components
-search = TavilySearchResults(
-    max_results=30,
-    time_range="year",
-)
+# Search, LLM and RAG clients are created on first use (see clients.py);
+# inject stand-ins with clients.set_client()
 
-llm_model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0)
-embed_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
 
-# Initialize RAG system
-rag_system = MultiDocumentRAG(
-    embed_model=embed_model,
-    chroma_path="./my_documents_db",
-    chunk_size=500,
-    chunk_overlap=50
-)
+# Where proposals are written
+OUTPUT_DIR = "C:/Users/noeln/OneDrive/Desktop/Agentic RAG/generate-personalised-rm-proposals/2. output"  # or an absolute path like "C:/Users/Noel/Documents/BankReports"
+
+# Token budgets for the packed prompt contexts (see context_packing.py)
+IDENTIFY_CONTEXT_TOKEN_BUDGET = 2000
+ANALYSIS_CONTEXT_TOKEN_BUDGET = 12000
 
 
 # Define the state
@@ -55,62 +63,245 @@ class RMProposalState(TypedDict):
     # Final output
     analysis: str
     error: str
+    
+    # Streaming: print/write the analysis as it is generated
+    stream_output: bool
+    time_to_first_token: float
+    generation_time: float
+    
+    # Per-node instrumentation, e.g. {"web_search": {"wall_time_s": 1.2, "search_calls": 1}}
+    metrics: Dict[str, Dict[str, float]]
+
+
+# Instrumentation: every node records wall time plus its external calls
+# (search, embeddings, Chroma, LLM), token counts and payload sizes. Search,
+# embedding, Chroma and BM25 calls are counted by the clients themselves
+# (see call_counts.py), so cache hits are not reported as API calls.
+def _add_metrics(metrics: Dict, node: str, **values) -> Dict:
+    """Return a copy of metrics with values added to the node's counters"""
+    node_metrics = dict(metrics.get(node, {}))
+    for key, value in values.items():
+        node_metrics[key] = node_metrics.get(key, 0) + value
+    return {**metrics, node: node_metrics}
+
+
+def _llm_metrics(usage, payload_chars: int, calls: int = 1) -> Dict:
+    """LLM call counters from a usage metadata callback"""
+    usage_by_model = usage.usage_metadata.values()
+    return {
+        "llm_calls": calls,
+        "prompt_tokens": sum(u.get("input_tokens", 0) for u in usage_by_model),
+        "completion_tokens": sum(u.get("output_tokens", 0) for u in usage_by_model),
+        "payload_chars": payload_chars,
+    }
+
+
+def instrument_node(name: str, node):
+    """Wrap a (sync or async) node so its wall time and call counts land in state['metrics']"""
+    def record(state, result, start, counts):
+        metrics = result.get("metrics", state.get("metrics", {}))
+        return {
+            **result,
+            "metrics": _add_metrics(
+                metrics, name, wall_time_s=time.perf_counter() - start, **counts
+            )
+        }
+    
+    if inspect.iscoroutinefunction(node):
+        @wraps(node)
+        async def async_wrapper(state):
+            start = time.perf_counter()
+            with collect_calls() as counts:
+                result = await node(state)
+            return record(state, result, start, counts)
+        return async_wrapper
+    
+    @wraps(node)
+    def wrapper(state):
+        start = time.perf_counter()
+        with collect_calls() as counts:
+            result = node(state)
+        return record(state, result, start, counts)
+    return wrapper
+
+
+_metrics_file_lock = threading.Lock()
+
+
+def emit_run_metrics(final_state: RMProposalState, path: str):
+    """Append one JSON line with the run's per-node metrics"""
+    metrics = final_state.get("metrics", {})
+    record = {
+        "company_name": final_state["company_name"],
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "error": final_state.get("error", ""),
+        "total_wall_time_s": sum(m.get("wall_time_s", 0) for m in metrics.values()),
+        "time_to_first_token": final_state.get("time_to_first_token", 0.0),
+        "generation_time": final_state.get("generation_time", 0.0),
+        "nodes": metrics,
+    }
+    
+    with _metrics_file_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+async def _ainvoke(client, payload):
+    """Call ``client.ainvoke`` if available, otherwise run ``invoke`` in a thread"""
+    if hasattr(client, "ainvoke"):
+        return await client.ainvoke(payload)
+    return await asyncio.to_thread(client.invoke, payload)
+
+
+def _web_result_blocks(web_results: list) -> List[str]:
+    """Format each web search result as a prompt block"""
+    web_context_parts = []
+    for i, result in enumerate(web_results, 1):
+        web_context_parts.append(
+            f"[Web Source {i}]\n"
+            f"Title: {result['title']}\n"
+            f"Content: {result['content']}\n"
+            f"URL: {result['url']}\n"
+            f"Score: {result.get('score', 'N/A')}"
+        )
+    
+    return web_context_parts
+
+
+def _format_web_results(web_results: list) -> str:
+    """Format web search results for the prompt context"""
+    return "\n\n".join(_web_result_blocks(web_results))
+
+
+def _pack_web_context(web_results: list, budget_tokens: int) -> str:
+    """
+    Keep the most relevant, non-duplicate web results that fit the budget
+    
+    Results keep their [Web Source N] numbers, so citations still match the
+    source list written by save_results_node.
+    """
+    blocks = _web_result_blocks(web_results)
+    chosen, _ = pack_blocks(
+        [(block, result.get('score')) for block, result in zip(blocks, web_results)],
+        budget_tokens
+    )
+    return "\n\n".join(blocks[i] for i in chosen)
+
+
+# The sync and async variant of each node share their prompt building,
+# parsing and state assembly through the helpers below; they differ only in
+# how the network call is made.
+def _web_search_input(state: RMProposalState, search) -> Dict:
+    """Search request for the company"""
+    print(f"🔍 [WEB SEARCH] Searching for: {state['company_name']}...")
+    # CachedSearch counts its own API calls; any other client calls the API every time
+    if not isinstance(search, CachedSearch):
+        count_call("search_calls")
+    return {"query": state['web_query']}
+
+
+def _web_search_result(state: RMProposalState, web_results: list) -> RMProposalState:
+    """Record the web search results"""
+    web_context = _format_web_results(web_results)
+    
+    print(f"✓ Found {len(web_results)} web sources")
+    
+    return {
+        **state,
+        "web_results": web_results,
+        "web_context": web_context,
+        "error": "",
+        "metrics": _add_metrics(
+            state['metrics'], "web_search",
+            results=len(web_results), payload_chars=len(web_context)
+        )
+    }
+
+
+def _web_search_error(state: RMProposalState, e: Exception) -> RMProposalState:
+    print(f"⚠️ Web search error: {e}")
+    return {
+        **state,
+        "web_results": [],
+        "web_context": "",
+        "error": f"Web search failed: {str(e)}"
+    }
 
 
 # Node 1: Web Search
 def web_search_node(state: RMProposalState) -> RMProposalState:
     """Perform web search using Tavily"""
-    print(f"🔍 [WEB SEARCH] Searching for: {state['company_name']}...")
+    search = get_search()
+    search_input = _web_search_input(state, search)
     
     try:
-        web_results = search.invoke({"query": state['web_query']})
-        
-        # Format web search results
-        web_context_parts = []
-        for i, result in enumerate(web_results, 1):
-            web_context_parts.append(
-                f"[Web Source {i}]\n"
-                f"Title: {result['title']}\n"
-                f"Content: {result['content']}\n"
-                f"URL: {result['url']}\n"
-                f"Score: {result.get('score', 'N/A')}"
-            )
-        
-        web_context = "\n\n".join(web_context_parts)
-        
-        print(f"✓ Found {len(web_results)} web sources")
-        
-        return {
-            **state,
-            "web_results": web_results,
-            "web_context": web_context,
-            "error": ""
-        }
+        return _web_search_result(state, search.invoke(search_input))
     
     except Exception as e:
-        print(f"⚠️ Web search error: {e}")
-        return {
-            **state,
-            "web_results": [],
-            "web_context": "",
-            "error": f"Web search failed: {str(e)}"
-        }
+        return _web_search_error(state, e)
 
 
-# Node 2: Identify Loan Products
-def identify_loan_products_node(state: RMProposalState) -> RMProposalState:
-    """Analyze web results and identify suitable loan products"""
+# Prompt to analyze company needs and suggest loan products
+# Loan products the analysis may suggest
+class LoanProduct(str, Enum):
+    WORKING_CAPITAL_LOAN = "Working Capital Loan"
+    REVOLVING_CREDIT = "Revolving Credit"
+    TERM_LOAN = "Term Loan"
+    BUSINESS_EXPANSION_LOAN = "Business Expansion Loan"
+    TRADE_FINANCE = "Trade Finance"
+    LETTER_OF_CREDIT = "Letter of Credit"
+    PROJECT_FINANCE = "Project Finance"
+    EQUIPMENT_FINANCING = "Equipment Financing"
+    ASSET_BASED_LENDING = "Asset-Based Lending"
+    BRIDGE_LOAN = "Bridge Loan"
+    SHORT_TERM_FINANCING = "Short-term Financing"
+    REFINANCING_FACILITY = "Refinancing Facility"
+    SME_LOAN = "SME Loan"
+    ENTERPRISE_FINANCING = "Enterprise Financing"
+    PROPERTY_DEVELOPMENT_LOAN = "Property Development Loan"
+    EXPORT_CREDIT = "Export Credit"
+    IMPORT_FINANCING = "Import Financing"
+
+
+_LOAN_PRODUCTS_BY_NAME = {product.value.lower(): product for product in LoanProduct}
+
+
+class LoanProductSuggestion(BaseModel):
+    """Loan products suggested for one company"""
     
-    print("💡 [LOAN ANALYSIS] Identifying suitable loan products...")
+    products: List[LoanProduct] = Field(
+        min_length=2,
+        max_length=4,
+        description="The 2-4 most relevant loan products, most relevant first"
+    )
     
-    try:
-        # Create a prompt to analyze company needs and suggest loan products
-        loan_analysis_prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a corporate banking expert specializing in loan product matching.
+    @field_validator("products", mode="before")
+    @classmethod
+    def _match_catalogue_names(cls, value):
+        """Accept catalogue names in any case, and "A / B" pairs from the prompt's list"""
+        if not isinstance(value, list):
+            return value
+        
+        matched = []
+        for name in value:
+            if isinstance(name, str):
+                parts = [name] + name.split("/")
+                name = next(
+                    (_LOAN_PRODUCTS_BY_NAME[p.strip().lower()] for p in parts
+                     if p.strip().lower() in _LOAN_PRODUCTS_BY_NAME),
+                    name
+                )
+            if name not in matched:
+                matched.append(name)
+        return matched
 
-            Based on the company's recent activities, financial situation, and business developments from web sources, identify which loan products would be most suitable.
 
-            Common loan products include:
+LOAN_PRODUCT_PARSER = PydanticOutputParser(pydantic_object=LoanProductSuggestion)
+
+# Unusable responses get this many correction requests before falling back
+MAX_LOAN_PRODUCT_REPAIRS = 1
+
+LOAN_PRODUCT_GUIDANCE = """Common loan products include:
             - Working Capital Loan / Revolving Credit
             - Term Loan / Business Expansion Loan
             - Trade Finance / Letter of Credit
@@ -126,160 +317,517 @@ def identify_loan_products_node(state: RMProposalState) -> RMProposalState:
             1. Business activities (expansion, acquisitions, operations)
             2. Financial needs (cash flow, capital requirements)
             3. Industry sector and typical financing needs
-            4. Growth stage and development plans
+            4. Growth stage and development plans"""
+
+LOAN_ANALYSIS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a corporate banking expert specializing in loan product matching.
+
+            Based on the company's recent activities, financial situation, and business developments from web sources, identify which loan products would be most suitable.
+
+            """ + LOAN_PRODUCT_GUIDANCE + """
 
-            Output ONLY a JSON array of 2-4 most relevant loan product names, for example:
-            ["Working Capital Loan", "Trade Finance", "Business Expansion Loan"]
+            Choose the 2-4 most relevant loan products, using only names from the list above (one name per entry, e.g. "Trade Finance", not "Trade Finance / Letter of Credit").
 
-            No explanations, just the JSON array."""),
-                        ("user", """Company: {company_name}
+            {format_instructions}
+
+            No explanations, just the JSON."""),
+        ("user", """Company: {company_name}
 
             Web Search Results:
             {web_context}
 
             Identify the most suitable loan products for this company.""")
-        ])
-        
-        chain = loan_analysis_prompt | llm_model | StrOutputParser()
-        response = chain.invoke({
-            "company_name": state['company_name'],
-            "web_context": state['web_context'][:8000]  # Limit context size
-        })
+]).partial(format_instructions=LOAN_PRODUCT_PARSER.get_format_instructions())
+
+LOAN_PRODUCTS_REPAIR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You correct loan product suggestions that could not be parsed.
+
+            """ + LOAN_PRODUCT_GUIDANCE.split("Analyze the company's:")[0].strip() + """
+
+            {format_instructions}
+
+            No explanations, just the JSON."""),
+        ("user", """This response could not be used:
+            {response}
+
+            Error: {error}
+
+            Return the same suggestion as valid JSON, using only names from the list.""")
+]).partial(format_instructions=LOAN_PRODUCT_PARSER.get_format_instructions())
+
+# Batch mode: several companies classified in one request
+LOAN_ANALYSIS_BATCH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a corporate banking expert specializing in loan product matching.
+
+            You will receive several companies, each under a numbered header with its web search results. For each company, identify which loan products would be most suitable based on its recent activities, financial situation, and business developments.
+
+            """ + LOAN_PRODUCT_GUIDANCE + """
+
+            Use only names from the list above, one name per entry. Output ONLY a JSON object that maps every company number (as a string) to a JSON array of its 2-4 most relevant loan product names, for example:
+            {{"1": ["Working Capital Loan", "Trade Finance"], "2": ["Project Finance", "Term Loan"]}}
+
+            No explanations, just the JSON object."""),
+        ("user", """{companies_context}
+
+            Identify the most suitable loan products for each company.""")
+])
+
+# Per-company web context in a batched request (kept short so a batch of
+# companies fits in about the same prompt as a few single requests)
+IDENTIFY_BATCH_CONTEXT_TOKEN_BUDGET = 600
+DEFAULT_IDENTIFY_BATCH_SIZE = 10
+
+# Reads the JSON object of a batched answer (code fences included); each
+# company's entry is then validated on its own against LoanProductSuggestion
+BATCH_LOAN_PRODUCT_PARSER = JsonOutputParser()
+
+# Fallback products when the LLM response cannot be used
+DEFAULT_LOAN_PRODUCTS = ["Working Capital Loan", "Business Expansion Loan"]
+
+
+def _loan_products_or_error(response: str):
+    """Validate an LLM response against LoanProductSuggestion: (products, None) or (None, error)"""
+    try:
+        suggestion = LOAN_PRODUCT_PARSER.parse(response)
+    except OutputParserException as e:
+        return None, str(e).split("\n")[0]
+    
+    return [product.value for product in suggestion.products], None
+
+
+def _print_loan_products(products: List[str]):
+    print(f"✓ Identified {len(products)} loan products:")
+    for product in products:
+        print(f"   - {product}")
+
+
+def _loan_products_result(state: RMProposalState, products, repairs: int, metrics: Dict) -> RMProposalState:
+    """Record the suggested products, falling back to the defaults if there are none"""
+    fallback = products is None
+    if fallback:
+        print(f"⚠️ Could not parse loan products, using defaults")
+        products = list(DEFAULT_LOAN_PRODUCTS)
+    
+    _print_loan_products(products)
+    
+    return {
+        **state,
+        "suggested_loan_products": products,
+        "metrics": _add_metrics(
+            state['metrics'], "identify_loan_products",
+            repairs=repairs, fallbacks=int(fallback), **metrics
+        )
+    }
+
+
+def _loan_analysis_chains(llm):
+    """The classification chain and the chain that repairs an unusable answer"""
+    return (
+        LOAN_ANALYSIS_PROMPT | llm | StrOutputParser(),
+        LOAN_PRODUCTS_REPAIR_PROMPT | llm | StrOutputParser()
+    )
+
+
+def _loan_analysis_input(state: RMProposalState) -> Dict:
+    """Classification prompt input with the packed web context"""
+    print("💡 [LOAN ANALYSIS] Identifying suitable loan products...")
+    return {
+        "company_name": state['company_name'],
+        "web_context": _pack_web_context(state['web_results'], IDENTIFY_CONTEXT_TOKEN_BUDGET)
+    }
+
+
+def _repair_input(response: str, error: str) -> Dict:
+    """Repair prompt input for an unusable classification"""
+    print(f"⚠️ Unusable loan products ({error}), requesting a correction...")
+    return {"response": response, "error": error}
+
+
+def _loan_analysis_error(e: Exception, repairs: int) -> Dict:
+    print(f"⚠️ Loan analysis error: {e}")
+    return {"llm_calls": 1 + repairs}
+
+
+# Node 2: Identify Loan Products
+def identify_loan_products_node(state: RMProposalState) -> RMProposalState:
+    """Analyze web results and identify suitable loan products"""
+    return _identify_loan_products(state, get_llm_model())
+
+
+def _identify_loan_products(state: RMProposalState, llm) -> RMProposalState:
+    """Classify one company with one LLM call"""
+    chain, repair_chain = _loan_analysis_chains(llm)
+    chain_input = _loan_analysis_input(state)
+    products, repairs = None, 0
+    
+    try:
+        with get_usage_metadata_callback() as usage:
+            response = chain.invoke(chain_input)
+            products, error = _loan_products_or_error(response)
+            
+            # Ask the model to correct an unusable answer a bounded number of times
+            while products is None and repairs < MAX_LOAN_PRODUCT_REPAIRS:
+                repairs += 1
+                response = repair_chain.invoke(_repair_input(response, error))
+                products, error = _loan_products_or_error(response)
         
-        # Parse JSON response
+        metrics = _llm_metrics(usage, len(chain_input['web_context']), calls=1 + repairs)
+    
+    except Exception as e:
+        metrics = _loan_analysis_error(e, repairs)
+    
+    return _loan_products_result(state, products, repairs, metrics)
+
+
+# Batch mode for Node 2: one LLM request classifies up to batch_size companies
+def _batch_payload(states: List[RMProposalState]):
+    """Numbered, truncated web contexts for one batched classification request"""
+    print(f"💡 [LOAN ANALYSIS] Classifying {len(states)} companies in one request...")
+    contexts = [
+        _pack_web_context(state['web_results'], IDENTIFY_BATCH_CONTEXT_TOKEN_BUDGET)
+        for state in states
+    ]
+    companies_context = "\n\n".join(
+        f"### Company {i}: {state['company_name']}\n{context}"
+        for i, (state, context) in enumerate(zip(states, contexts), 1)
+    )
+    return {"companies_context": companies_context}, sum(len(c) for c in contexts)
+
+
+def _parse_batch_loan_products(response: str, count: int) -> Dict[int, List[str]]:
+    """
+    Parse {"1": [...], "2": [...]} into products per batch position (0-based)
+    
+    An entry that fails LoanProductSuggestion validation is left out, so
+    only that company is retried individually.
+    """
+    try:
+        parsed = BATCH_LOAN_PRODUCT_PARSER.parse(response)
+    except OutputParserException:
+        return {}
+    
+    if not isinstance(parsed, dict):
+        return {}
+    
+    products = {}
+    for key, value in parsed.items():
         try:
-            # Clean up response
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response.replace("```json", "").replace("```", "").strip()
-            
-            suggested_products = json.loads(response)
-            
-            if not isinstance(suggested_products, list):
-                suggested_products = []
+            position = int(key) - 1
+        except ValueError:
+            continue
+        if not 0 <= position < count:
+            continue
         
-        except json.JSONDecodeError:
-            print(f"⚠️ Could not parse loan products, using defaults")
-            suggested_products = ["Working Capital Loan", "Business Expansion Loan"]
+        try:
+            suggestion = LoanProductSuggestion.model_validate(
+                value if isinstance(value, dict) else {"products": value}
+            )
+        except ValidationError:
+            continue
+        products[position] = [product.value for product in suggestion.products]
+    
+    return products
+
+
+def _batch_results(states, parsed, batch_metrics, elapsed):
+    """
+    Apply a batch response to its states
+    
+    The request's calls, tokens and wall time are split evenly across the
+    companies in it. Returns (state, classified) pairs; companies missing
+    from the response are not classified, so the caller can retry them
+    individually.
+    """
+    share = {key: value / len(states) for key, value in batch_metrics.items()}
+    results = []
+    
+    for i, state in enumerate(states):
+        metrics = _add_metrics(
+            state['metrics'], "identify_loan_products",
+            batched=1, wall_time_s=elapsed / len(states), **share
+        )
         
-        print(f"✓ Identified {len(suggested_products)} loan products:")
-        for product in suggested_products:
-            print(f"   - {product}")
+        if i not in parsed:
+            results.append(({**state, "metrics": metrics}, False))
+            continue
         
-        return {
-            **state,
-            "suggested_loan_products": suggested_products
-        }
+        print(f"✓ {state['company_name']}: {', '.join(parsed[i])}")
+        results.append(({**state, "suggested_loan_products": parsed[i], "metrics": metrics}, True))
+    
+    if len(parsed) < len(states):
+        print(f"⚠️ {len(states) - len(parsed)} of {len(states)} companies missing from "
+              "batch response, classifying them individually")
+    
+    return results
+
+
+def _batch_error(e: Exception):
+    """Parsed products and metrics for a batch request that failed"""
+    print(f"⚠️ Batch loan analysis error: {e}")
+    return {}, {"llm_calls": 1}
+
+
+def _classify_batch(chain, batch: List[RMProposalState], single) -> List[RMProposalState]:
+    """Classify one batch, retrying companies the response missed with single()"""
+    payload, payload_chars = _batch_payload(batch)
+    batch_start = time.perf_counter()
     
+    try:
+        with get_usage_metadata_callback() as usage:
+            response = chain.invoke(payload)
+        parsed = _parse_batch_loan_products(response, len(batch))
+        batch_metrics = _llm_metrics(usage, payload_chars)
     except Exception as e:
-        print(f"⚠️ Loan analysis error: {e}")
-        return {
-            **state,
-            "suggested_loan_products": ["Working Capital Loan", "Business Expansion Loan"]
-        }
+        parsed, batch_metrics = _batch_error(e)
+    
+    batch_results = _batch_results(batch, parsed, batch_metrics, time.perf_counter() - batch_start)
+    return [state if classified else single(state) for state, classified in batch_results]
 
 
-# Node 3: Retrieve Product Info Sheets
-def retrieve_product_info_node(state: RMProposalState) -> RMProposalState:
-    """Search vectorstore for loan product information sheets"""
+def identify_loan_products_batch(
+    states: List[RMProposalState],
+    batch_size: int = DEFAULT_IDENTIFY_BATCH_SIZE,
+    llm=None,
+    executor: Optional[Executor] = None
+) -> List[RMProposalState]:
+    """
+    Identify loan products for many companies with one LLM call per batch
+    
+    Each company's web context is truncated to
+    IDENTIFY_BATCH_CONTEXT_TOKEN_BUDGET tokens and up to batch_size
+    companies share one request whose JSON answer is split back per company.
+    Companies the response does not cover (or a batch that fails to parse)
+    fall back to the single-company call.
+    
+    Args:
+        states: States that have been through web_search
+        batch_size: Companies per LLM request
+        llm: Chat model to use (defaults to ``clients.get_llm_model()``)
+        executor: Runs the batches concurrently (e.g. the batch runner's
+            thread pool); without one they run one after another
+    
+    Returns the states with suggested_loan_products set, in input order.
+    """
+    llm = llm or get_llm_model()
+    chain = LOAN_ANALYSIS_BATCH_PROMPT | llm | StrOutputParser()
+    single = instrument_node("identify_loan_products", lambda state: _identify_loan_products(state, llm))
+    batches = [states[start:start + batch_size] for start in range(0, len(states), batch_size)]
     
+    if executor is None:
+        classified = [_classify_batch(chain, batch, single) for batch in batches]
+    else:
+        classified = executor.map(lambda batch: _classify_batch(chain, batch, single), batches)
+    
+    return [state for batch in classified for state in batch]
+
+
+def _product_info_query(product_name: str) -> str:
+    """Create search query for a product info sheet"""
+    return f"{product_name} product information sheet eligibility criteria requirements"
+
+
+# Unknown products are searched for among the product sheets only
+PRODUCT_SHEET_FILTER = {"document_type": {"$in": list(SHEET_DOCUMENT_TYPES)}}
+
+
+def _search_product_sheets(rag_system, products: List[str]):
+    """
+    Search the product sheets for products the product index does not know
+    
+    A store ingested before chunks carried document_type metadata matches
+    nothing with the filter, so it is then searched again without it.
+    """
+    queries = [_product_info_query(p) for p in products]
+    results = rag_system.query_many(queries, k=5, where=PRODUCT_SHEET_FILTER)
+    if not any(results):
+        results = rag_system.query_many(queries, k=5)
+    return [doc for docs in results for doc in docs]
+
+
+async def _asearch_product_sheets(rag_system, products: List[str]):
+    """Async version of _search_product_sheets"""
+    queries = [_product_info_query(p) for p in products]
+    results = await rag_system.aquery_many(queries, k=5, where=PRODUCT_SHEET_FILTER)
+    if not any(results):
+        results = await rag_system.aquery_many(queries, k=5)
+    return [doc for docs in results for doc in docs]
+
+
+def _product_info_blocks(product_info_docs: list) -> List[str]:
+    """Format each product info doc as a prompt block"""
+    product_info_parts = []
+    for i, doc in enumerate(product_info_docs, 1):
+        source = os.path.basename(doc.metadata.get('source', 'Unknown'))
+        product_info_parts.append(
+            f"[Product Info {i}: {source}]\n"
+            f"Content: {doc.page_content}"
+        )
+    
+    return product_info_parts
+
+
+def _product_info_update(product_info_docs: list) -> Dict:
+    """De-duplicate retrieved product info docs and format them for the prompt"""
+    # Remove duplicates based on content
+    seen_content = set()
+    unique_docs = []
+    for doc in product_info_docs:
+        content_hash = hash(doc.page_content[:200])
+        if content_hash not in seen_content:
+            seen_content.add(content_hash)
+            unique_docs.append(doc)
+    
+    product_info_docs = unique_docs
+    
+    product_info_context = "\n\n".join(_product_info_blocks(product_info_docs))
+    print(f"✓ Found {len(product_info_docs)} product info documents")
+    
+    return {
+        "product_info_docs": product_info_docs,
+        "product_info_context": product_info_context
+    }
+
+
+def _indexed_product_docs(product_index, products: List[str]):
+    """Product sheet chunks from the product index, plus the names it does not know"""
+    found, unknown = product_index.lookup_many(products)
+    
+    for product_name in products:
+        if product_name in unknown:
+            print(f"   Searching: {product_name} (not in product index)...")
+        else:
+            print(f"   Indexed: {product_name} → {product_index.resolve(product_name)}")
+    
+    return [doc for docs in found.values() for doc in docs], unknown
+
+
+def _retrieval_result(state: RMProposalState, docs: list, index_hits: int) -> RMProposalState:
+    """Record retrieved product info and the retrieval metrics"""
+    update = _product_info_update(docs)
+    
+    return {
+        **state,
+        **update,
+        "metrics": _add_metrics(
+            state['metrics'], "retrieve_product_info",
+            index_hits=index_hits,
+            documents=len(update['product_info_docs']),
+            payload_chars=len(update['product_info_context'])
+        )
+    }
+
+
+def _skip_retrieval(state: RMProposalState) -> bool:
+    """Announce the retrieval step; True when vectorstore search is disabled"""
     if not state['use_vectorstore']:
         print("⏭️  [PRODUCT INFO] Skipping vectorstore search (disabled)")
-        return {
-            **state,
-            "product_info_docs": [],
-            "product_info_context": ""
-        }
+        return True
     
     print(f"📋 [PRODUCT INFO] Searching for product information sheets...")
+    return False
+
+
+def _without_product_info(state: RMProposalState) -> RMProposalState:
+    return {
+        **state,
+        "product_info_docs": [],
+        "product_info_context": ""
+    }
+
+
+def _retrieval_error(state: RMProposalState, e: Exception) -> RMProposalState:
+    print(f"⚠️ Could not retrieve product info: {e}")
+    return _without_product_info(state)
+
+
+# Node 3: Retrieve Product Info Sheets
+def retrieve_product_info_node(state: RMProposalState) -> RMProposalState:
+    """Look up loan product information sheets (product index first, then vectorstore)"""
+    if _skip_retrieval(state):
+        return _without_product_info(state)
     
     try:
-        product_info_docs = []
+        # Known products map straight to their sheet via the product index
+        products = state['suggested_loan_products']
+        rag_system = get_rag_system()
+        product_info_docs, unknown = _indexed_product_docs(rag_system.get_product_index(), products)
         
-        # Search for each suggested loan product
-        for product_name in state['suggested_loan_products']:
-            # Create search query for product info sheet
-            query = f"{product_name} product information sheet eligibility criteria requirements"
-            print(f"   Searching: {product_name}...")
-            
-            retriever = rag_system.get_retriever(search_kwargs={"k": 5})
-            docs = retriever.invoke(query)
-            product_info_docs.extend(docs)
-        
-        # Remove duplicates based on content
-        seen_content = set()
-        unique_docs = []
-        for doc in product_info_docs:
-            content_hash = hash(doc.page_content[:200])
-            if content_hash not in seen_content:
-                seen_content.add(content_hash)
-                unique_docs.append(doc)
-        
-        product_info_docs = unique_docs
-        
-        # Format product info results
-        product_info_parts = []
-        for i, doc in enumerate(product_info_docs, 1):
-            source = os.path.basename(doc.metadata.get('source', 'Unknown'))
-            product_info_parts.append(
-                f"[Product Info {i}: {source}]\n"
-                f"Content: {doc.page_content}"
-            )
-        
-        product_info_context = "\n\n".join(product_info_parts)
-        print(f"✓ Found {len(product_info_docs)} product info documents")
+        if unknown:
+            # Embed the remaining product queries in one batch and search the product sheets
+            product_info_docs += _search_product_sheets(rag_system, unknown)
         
-        return {
-            **state,
-            "product_info_docs": product_info_docs,
-            "product_info_context": product_info_context
-        }
+        return _retrieval_result(state, product_info_docs, len(products) - len(unknown))
     
     except Exception as e:
-        print(f"⚠️ Could not retrieve product info: {e}")
-        return {
-            **state,
-            "product_info_docs": [],
-            "product_info_context": ""
-        }
+        return _retrieval_error(state, e)
 
 
 # Node 4: Combine Contexts
 def combine_contexts_node(state: RMProposalState) -> RMProposalState:
-    """Combine all contexts"""
+    """
+    Combine all contexts within ANALYSIS_CONTEXT_TOKEN_BUDGET
+    
+    Product criteria are packed first (up to half the budget, best
+    retrieval matches first) since the eligibility check depends on them;
+    web results fill the rest, ranked by Tavily score. Near-duplicate
+    snippets are dropped from both.
+    """
     print("🔗 [COMBINING] Merging all contexts...")
     
     sections = []
     
-    # Web search results
-    sections.append("=== WEB SEARCH RESULTS ===\n\n" + state['web_context'])
-    
     # Suggested loan products
+    products_list = ""
     if state['suggested_loan_products']:
         products_list = "\n".join([f"- {p}" for p in state['suggested_loan_products']])
-        sections.append(f"=== SUGGESTED LOAN PRODUCTS ===\n\n{products_list}")
     
     # Product information sheets
-    if state['product_info_context']:
-        sections.append("=== LOAN PRODUCT INFORMATION SHEETS ===\n\n" + state['product_info_context'])
+    product_blocks = _product_info_blocks(state['product_info_docs'])
+    chosen_products, product_tokens = pack_blocks(
+        [
+            (block, doc.metadata.get('relevance_score'))
+            for block, doc in zip(product_blocks, state['product_info_docs'])
+        ],
+        ANALYSIS_CONTEXT_TOKEN_BUDGET // 2
+    )
+    
+    # Web search results get whatever is left
+    web_blocks = _web_result_blocks(state['web_results'])
+    chosen_web, web_tokens = pack_blocks(
+        [(block, result.get('score')) for block, result in zip(web_blocks, state['web_results'])],
+        ANALYSIS_CONTEXT_TOKEN_BUDGET - product_tokens
+    )
+    
+    sections.append("=== WEB SEARCH RESULTS ===\n\n" + "\n\n".join(web_blocks[i] for i in chosen_web))
+    
+    if products_list:
+        sections.append(f"=== SUGGESTED LOAN PRODUCTS ===\n\n{products_list}")
+    
+    if chosen_products:
+        sections.append(
+            "=== LOAN PRODUCT INFORMATION SHEETS ===\n\n"
+            + "\n\n".join(product_blocks[i] for i in chosen_products)
+        )
     
     combined_context = "\n\n".join(sections)
     
-    print("✓ Contexts combined")
+    print(f"✓ Contexts combined: {len(chosen_web)}/{len(web_blocks)} web sources, "
+          f"{len(chosen_products)}/{len(product_blocks)} product chunks, "
+          f"~{web_tokens + product_tokens} tokens")
     
     return {
         **state,
-        "combined_context": combined_context
+        "combined_context": combined_context,
+        "metrics": _add_metrics(
+            state['metrics'], "combine_contexts",
+            context_tokens=count_tokens(combined_context), payload_chars=len(combined_context)
+        )
     }
 
 
-# Node 5: Generate Analysis with Eligibility Check
-def generate_analysis_node(state: RMProposalState) -> RMProposalState:
-    """Generate the RM proposal analysis with eligibility assessment"""
-    print("🤖 [GENERATING] Creating analysis with eligibility check...\n")
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a senior Relationship Manager (RM) analyst for corporate banking in Malaysia.
+# Prompt for the RM proposal with eligibility assessment
+RM_PROPOSAL_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a senior Relationship Manager (RM) analyst for corporate banking in Malaysia.
 
         Your task: Based on web search results, recommended loan products, and product information sheets, create a comprehensive RM proposal with ELIGIBILITY ASSESSMENT.
 
@@ -344,36 +892,143 @@ def generate_analysis_node(state: RMProposalState) -> RMProposalState:
         - Be EXPLICIT when information is not available publicly
         - Do not assume internal customer data - only assess what can be determined from web sources
         - Clearly distinguish between confirmed from public sources vs requires verification"""),
-                ("user", """Company: {company_name}
+    ("user", """Company: {company_name}
 
         Context:
         {context}
 
         Please provide a comprehensive RM proposal analysis with detailed eligibility assessment.""")
-    ])
+])
+
+
+def _output_filename(company_name: str) -> str:
+    """Path of the proposal file for a company"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)  # ensures the directory exists
+    return os.path.join(OUTPUT_DIR, f"{company_name.replace(' ', '_')}_eligibility_analysis.txt")
+
+
+def _write_proposal_header(f, state: RMProposalState):
+    """Write the title and suggested products that precede the analysis"""
+    f.write(f"RM PROPOSAL WITH ELIGIBILITY ANALYSIS: {state['company_name']}\n")
+    f.write("="*80 + "\n")
+    f.write("(Web Search + Product Info Sheets)\n")
+    f.write("="*80 + "\n\n")
+    
+    # Suggested products
+    if state['suggested_loan_products']:
+        f.write("🎯 SUGGESTED LOAN PRODUCTS:\n")
+        for i, product in enumerate(state['suggested_loan_products'], 1):
+            f.write(f"   {i}. {product}\n")
+        f.write("\n" + "="*80 + "\n\n")
+
+
+def _generation_result(
+    state: RMProposalState,
+    analysis: str,
+    start: float,
+    first_token_at,
+    usage
+) -> RMProposalState:
+    """Record the analysis, its timings and LLM usage"""
+    generation_time = time.perf_counter() - start
+    time_to_first_token = (first_token_at or time.perf_counter()) - start
+    
+    print(f"✓ Analysis with eligibility check generated "
+          f"(first token {time_to_first_token:.1f}s, total {generation_time:.1f}s)")
+    
+    return {
+        **state,
+        "analysis": analysis,
+        "time_to_first_token": time_to_first_token,
+        "generation_time": generation_time,
+        "metrics": _add_metrics(
+            state['metrics'], "generate_analysis",
+            **_llm_metrics(usage, len(state['combined_context']))
+        )
+    }
+
+
+def _analysis_input(state: RMProposalState) -> Dict:
+    """RM proposal prompt input"""
+    print("🤖 [GENERATING] Creating analysis with eligibility check...\n")
+    return {
+        "company_name": state['company_name'],
+        "context": state['combined_context']
+    }
+
+
+class _ProposalStream:
+    """
+    Streamed analysis chunks, echoed to the console and the output file
+    
+    The file gets the proposal header first; save_results_node later
+    rewrites it with the source lists.
+    """
+    
+    def __init__(self, state: RMProposalState):
+        self.state = state
+        self.parts = []
+        self.first_token_at = None
+    
+    def __enter__(self):
+        self._file = open(_output_filename(self.state['company_name']), "w", encoding="utf-8")
+        _write_proposal_header(self._file, self.state)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            print("\n")
+    
+    def write(self, chunk: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.parts.append(chunk)
+        print(chunk, end="", flush=True)
+        self._file.write(chunk)
+        self._file.flush()
+    
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+def _generation_error(state: RMProposalState, e: Exception) -> RMProposalState:
+    print(f"⚠️ Analysis generation error: {e}")
+    return {
+        **state,
+        "analysis": "",
+        "error": f"Analysis generation failed: {str(e)}",
+        "metrics": _add_metrics(state['metrics'], "generate_analysis", llm_calls=1)
+    }
+
+
+# Node 5: Generate Analysis with Eligibility Check
+def generate_analysis_node(state: RMProposalState) -> RMProposalState:
+    """
+    Generate the RM proposal analysis with eligibility assessment
     
-    chain = prompt | llm_model | StrOutputParser()
+    With state['stream_output'] the tokens are printed and appended to the
+    output file as they arrive; save_results_node then rewrites the file
+    with the source lists.
+    """
+    chain = RM_PROPOSAL_PROMPT | get_llm_model() | StrOutputParser()
+    chain_input = _analysis_input(state)
+    start = time.perf_counter()
     
     try:
-        analysis = chain.invoke({
-            "company_name": state['company_name'],
-            "context": state['combined_context']
-        })
-        
-        print("✓ Analysis with eligibility check generated")
+        with get_usage_metadata_callback() as usage:
+            if not state.get('stream_output'):
+                return _generation_result(state, chain.invoke(chain_input), start, None, usage)
+            
+            with _ProposalStream(state) as stream:
+                for chunk in chain.stream(chain_input):
+                    stream.write(chunk)
         
-        return {
-            **state,
-            "analysis": analysis
-        }
+        return _generation_result(state, stream.text, start, stream.first_token_at, usage)
     
     except Exception as e:
-        print(f"⚠️ Analysis generation error: {e}")
-        return {
-            **state,
-            "analysis": "",
-            "error": f"Analysis generation failed: {str(e)}"
-        }
+        return _generation_error(state, e)
 
 
 # Node 6: Save Results
@@ -385,24 +1040,12 @@ def save_results_node(state: RMProposalState) -> RMProposalState:
     analysis = state['analysis']
     web_results = state['web_results']
 
-    output_dir = "C:/Users/noeln/OneDrive/Desktop/Agentic RAG/generate-personalised-rm-proposals/2. output"  # or an absolute path like "C:/Users/Noel/Documents/BankReports"
-    os.makedirs(output_dir, exist_ok=True)  # ensures the directory exists
-    filename = os.path.join(output_dir, f"{company_name.replace(' ', '_')}_eligibility_analysis.txt")
+    filename = _output_filename(company_name)
     # filename = f"{company_name.replace(' ', '_')}_eligibility_analysis.txt"
     
     try:
         with open(filename, "w", encoding="utf-8") as f:
-            f.write(f"RM PROPOSAL WITH ELIGIBILITY ANALYSIS: {company_name}\n")
-            f.write("="*80 + "\n")
-            f.write("(Web Search + Product Info Sheets)\n")
-            f.write("="*80 + "\n\n")
-            
-            # Suggested products
-            if state['suggested_loan_products']:
-                f.write("🎯 SUGGESTED LOAN PRODUCTS:\n")
-                for i, product in enumerate(state['suggested_loan_products'], 1):
-                    f.write(f"   {i}. {product}\n")
-                f.write("\n" + "="*80 + "\n\n")
+            _write_proposal_header(f, state)
             
             f.write(analysis)
             f.write("\n\n" + "="*80 + "\n")
@@ -432,37 +1075,356 @@ def save_results_node(state: RMProposalState) -> RMProposalState:
         }
 
 
+# Async node variants: same behaviour as the nodes above, but every network
+# call (Tavily, Gemini, retriever) is awaited so many company runs can share
+# one event loop. Combining contexts and saving results stay synchronous.
+async def aweb_search_node(state: RMProposalState) -> RMProposalState:
+    """Perform web search using Tavily (async)"""
+    search = get_search()
+    search_input = _web_search_input(state, search)
+    
+    try:
+        return _web_search_result(state, await _ainvoke(search, search_input))
+    
+    except Exception as e:
+        return _web_search_error(state, e)
+
+
+async def aidentify_loan_products_node(state: RMProposalState) -> RMProposalState:
+    """Analyze web results and identify suitable loan products (async)"""
+    return await _aidentify_loan_products(state, get_llm_model())
+
+
+async def _aidentify_loan_products(state: RMProposalState, llm) -> RMProposalState:
+    """Classify one company with one LLM call (async)"""
+    chain, repair_chain = _loan_analysis_chains(llm)
+    chain_input = _loan_analysis_input(state)
+    products, repairs = None, 0
+    
+    try:
+        with get_usage_metadata_callback() as usage:
+            response = await chain.ainvoke(chain_input)
+            products, error = _loan_products_or_error(response)
+            
+            # Ask the model to correct an unusable answer a bounded number of times
+            while products is None and repairs < MAX_LOAN_PRODUCT_REPAIRS:
+                repairs += 1
+                response = await repair_chain.ainvoke(_repair_input(response, error))
+                products, error = _loan_products_or_error(response)
+        
+        metrics = _llm_metrics(usage, len(chain_input['web_context']), calls=1 + repairs)
+    
+    except Exception as e:
+        metrics = _loan_analysis_error(e, repairs)
+    
+    return _loan_products_result(state, products, repairs, metrics)
+
+
+async def aretrieve_product_info_node(state: RMProposalState) -> RMProposalState:
+    """Look up loan product information sheets (async)"""
+    if _skip_retrieval(state):
+        return _without_product_info(state)
+    
+    try:
+        # Known products map straight to their sheet via the product index
+        products = state['suggested_loan_products']
+        rag_system = get_rag_system()
+        product_index = await asyncio.to_thread(rag_system.get_product_index)
+        product_info_docs, unknown = _indexed_product_docs(product_index, products)
+        
+        if unknown:
+            # Embed the remaining product queries in one batch and search the product sheets
+            product_info_docs += await _asearch_product_sheets(rag_system, unknown)
+        
+        return _retrieval_result(state, product_info_docs, len(products) - len(unknown))
+    
+    except Exception as e:
+        return _retrieval_error(state, e)
+
+
+async def _aclassify_batch(chain, batch: List[RMProposalState], single) -> List[RMProposalState]:
+    """Async version of _classify_batch"""
+    payload, payload_chars = _batch_payload(batch)
+    batch_start = time.perf_counter()
+    
+    try:
+        with get_usage_metadata_callback() as usage:
+            response = await chain.ainvoke(payload)
+        parsed = _parse_batch_loan_products(response, len(batch))
+        batch_metrics = _llm_metrics(usage, payload_chars)
+    except Exception as e:
+        parsed, batch_metrics = _batch_error(e)
+    
+    batch_results = _batch_results(batch, parsed, batch_metrics, time.perf_counter() - batch_start)
+    return [state if classified else await single(state) for state, classified in batch_results]
+
+
+async def aidentify_loan_products_batch(
+    states: List[RMProposalState],
+    batch_size: int = DEFAULT_IDENTIFY_BATCH_SIZE,
+    llm=None,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> List[RMProposalState]:
+    """
+    Async version of ``identify_loan_products_batch``
+    
+    Each batch request holds the semaphore while it runs (e.g. the batch
+    runner's, so classification respects its max_concurrency); without one
+    the batches run one after another.
+    """
+    llm = llm or get_llm_model()
+    semaphore = semaphore or asyncio.Semaphore(1)
+    chain = LOAN_ANALYSIS_BATCH_PROMPT | llm | StrOutputParser()
+    
+    async def classify_single(state):
+        return await _aidentify_loan_products(state, llm)
+    
+    single = instrument_node("identify_loan_products", classify_single)
+    
+    async def classify(batch):
+        async with semaphore:
+            return await _aclassify_batch(chain, batch, single)
+    
+    batches = await asyncio.gather(*(
+        classify(states[start:start + batch_size])
+        for start in range(0, len(states), batch_size)
+    ))
+    return [state for batch in batches for state in batch]
+
+
+async def agenerate_analysis_node(state: RMProposalState) -> RMProposalState:
+    """Generate the RM proposal analysis with eligibility assessment (async)"""
+    chain = RM_PROPOSAL_PROMPT | get_llm_model() | StrOutputParser()
+    chain_input = _analysis_input(state)
+    start = time.perf_counter()
+    
+    try:
+        with get_usage_metadata_callback() as usage:
+            if not state.get('stream_output'):
+                return _generation_result(state, await chain.ainvoke(chain_input), start, None, usage)
+            
+            with _ProposalStream(state) as stream:
+                async for chunk in chain.astream(chain_input):
+                    stream.write(chunk)
+        
+        return _generation_result(state, stream.text, start, stream.first_token_at, usage)
+    
+    except Exception as e:
+        return _generation_error(state, e)
+
+
 # Build the graph
-def create_rm_proposal_graph():
-    """Create the LangGraph workflow"""
+# Node order of the workflow
+GRAPH_NODES = [
+    "web_search",
+    "identify_loan_products",
+    "retrieve_product_info",
+    "combine_contexts",
+    "generate_analysis",
+    "save_results",
+]
+
+
+def create_rm_proposal_graph(
+    async_nodes: bool = False,
+    checkpointer=None,
+    entry_point: str = "web_search"
+):
+    """
+    Create the LangGraph workflow
+    
+    Args:
+        async_nodes: Use the async node variants; the compiled graph must then
+            be run with ``ainvoke``
+        checkpointer: Optional LangGraph checkpointer (see
+            ``create_sqlite_checkpointer``); the state is then saved after
+            every node so a run can resume with ``run_with_checkpoint``
+        entry_point: Node to start from; earlier nodes are left out, so the
+            input state must already hold their results (e.g.
+            "retrieve_product_info" after ``identify_loan_products_batch``)
+    """
+    
+    if entry_point not in GRAPH_NODES:
+        raise ValueError(f"Unknown entry point: {entry_point}. Nodes: {GRAPH_NODES}")
     
     workflow = StateGraph(RMProposalState)
     
     # Add nodes
-    workflow.add_node("web_search", web_search_node)
-    workflow.add_node("identify_loan_products", identify_loan_products_node)
-    workflow.add_node("retrieve_product_info", retrieve_product_info_node)
-    workflow.add_node("combine_contexts", combine_contexts_node)
-    workflow.add_node("generate_analysis", generate_analysis_node)
-    workflow.add_node("save_results", save_results_node)
+    if async_nodes:
+        nodes = {
+            "web_search": aweb_search_node,
+            "identify_loan_products": aidentify_loan_products_node,
+            "retrieve_product_info": aretrieve_product_info_node,
+            "combine_contexts": combine_contexts_node,
+            "generate_analysis": agenerate_analysis_node,
+            "save_results": save_results_node,
+        }
+    else:
+        nodes = {
+            "web_search": web_search_node,
+            "identify_loan_products": identify_loan_products_node,
+            "retrieve_product_info": retrieve_product_info_node,
+            "combine_contexts": combine_contexts_node,
+            "generate_analysis": generate_analysis_node,
+            "save_results": save_results_node,
+        }
+    
+    flow = GRAPH_NODES[GRAPH_NODES.index(entry_point):]
+    for name in flow:
+        workflow.add_node(name, instrument_node(name, nodes[name]))
     
     # Define the flow
-    workflow.set_entry_point("web_search")
-    workflow.add_edge("web_search", "identify_loan_products")
-    workflow.add_edge("identify_loan_products", "retrieve_product_info")
-    workflow.add_edge("retrieve_product_info", "combine_contexts")
-    workflow.add_edge("combine_contexts", "generate_analysis")
-    workflow.add_edge("generate_analysis", "save_results")
-    workflow.add_edge("save_results", END)
+    workflow.set_entry_point(entry_point)
+    for source, target in zip(flow, flow[1:]):
+        workflow.add_edge(source, target)
+    workflow.add_edge(flow[-1], END)
+    
+    return workflow.compile(checkpointer=checkpointer)
+
+
+# Checkpointing: resume a company from its last completed node
+DEFAULT_CHECKPOINT_DB = "./rm_proposal_checkpoints.sqlite3"
+
+# Nodes that report failures through state['error'] instead of raising, and
+# the node to re-run for each (web search failures restart the whole run)
+RESUME_NODE_FOR_ERROR = {
+    "Analysis generation failed": "generate_analysis",
+    "Save failed": "save_results",
+}
+
+
+def create_sqlite_checkpointer(db_path: str = DEFAULT_CHECKPOINT_DB):
+    """Create a SQLite checkpointer shared by all runs in this process"""
+    # Optional dependency: pip install langgraph-checkpoint-sqlite
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    
+    return SqliteSaver(sqlite3.connect(db_path, check_same_thread=False))
+
+
+def checkpoint_config(company_name: str, run_id: str) -> Dict:
+    """Graph config whose thread ID identifies one company within one run"""
+    return {"configurable": {"thread_id": f"{run_id}:{company_name}"}}
+
+
+def _resume_point(snapshot, history):
+    """
+    Decide how to continue a checkpointed run
+    
+    Returns ("start", None), ("done", None) or ("resume", config) where
+    config points at the checkpoint to continue from.
+    """
+    if not snapshot.values:
+        return "start", None
+    
+    # Interrupted mid-graph (e.g. process killed or a node raised)
+    if snapshot.next:
+        return "resume", snapshot.config
     
-    return workflow.compile()
+    error = snapshot.values.get("error", "")
+    if not error:
+        return "done", None
+    
+    resume_node = next(
+        (node for prefix, node in RESUME_NODE_FOR_ERROR.items() if error.startswith(prefix)),
+        None
+    )
+    
+    # Find the checkpoint taken just before the failed node ran
+    for past in history:
+        if resume_node and past.next == (resume_node,):
+            return "resume", past.config
+    
+    return "start", None
+
+
+def checkpoint_action(app, config: Dict) -> str:
+    """Return "start", "resume" or "done" for a company's checkpointed run"""
+    return _resume_point(app.get_state(config), app.get_state_history(config))[0]
+
+
+async def acheckpoint_action(app, config: Dict) -> str:
+    """Async version of ``checkpoint_action``"""
+    history = [past async for past in app.aget_state_history(config)]
+    return _resume_point(await app.aget_state(config), history)[0]
+
+
+def run_with_checkpoint(app, initial_state: RMProposalState, config: Dict) -> RMProposalState:
+    """
+    Run a checkpointed graph, resuming from the last completed node
+    
+    A company that already finished cleanly is not re-run; one that failed
+    in generate_analysis or save_results re-runs from that node, reusing
+    the saved web search, loan products and product info.
+    """
+    action, resume_config = _resume_point(
+        app.get_state(config), app.get_state_history(config)
+    )
+    
+    if action == "done":
+        print(f"⏭️  [CHECKPOINT] {initial_state['company_name']} already completed")
+        return app.get_state(config).values
+    
+    if action == "resume":
+        print(f"♻️  [CHECKPOINT] Resuming {initial_state['company_name']} from saved state")
+        return app.invoke(None, resume_config)
+    
+    return app.invoke(initial_state, config)
+
+
+async def arun_with_checkpoint(app, initial_state: RMProposalState, config: Dict) -> RMProposalState:
+    """Async version of ``run_with_checkpoint`` (use an async checkpointer)"""
+    history = [past async for past in app.aget_state_history(config)]
+    action, resume_config = _resume_point(await app.aget_state(config), history)
+    
+    if action == "done":
+        print(f"⏭️  [CHECKPOINT] {initial_state['company_name']} already completed")
+        return (await app.aget_state(config)).values
+    
+    if action == "resume":
+        print(f"♻️  [CHECKPOINT] Resuming {initial_state['company_name']} from saved state")
+        return await app.ainvoke(None, resume_config)
+    
+    return await app.ainvoke(initial_state, config)
+
+
+def default_web_query(company_name: str) -> str:
+    """Auto-generate the web search query for a company"""
+    return f"{company_name} Malaysia news financial performance expansion plans 2024 2025"
+
+
+def build_initial_state(
+    company_name: str,
+    web_query: str,
+    use_vectorstore: bool = True,
+    stream_output: bool = False
+) -> RMProposalState:
+    """Build the initial graph state for one company"""
+    return {
+        "company_name": company_name,
+        "web_query": web_query,
+        "use_vectorstore": use_vectorstore,
+        "web_results": [],
+        "web_context": "",
+        "suggested_loan_products": [],
+        "product_info_docs": [],
+        "product_info_context": "",
+        "combined_context": "",
+        "analysis": "",
+        "error": "",
+        "stream_output": stream_output,
+        "time_to_first_token": 0.0,
+        "generation_time": 0.0,
+        "metrics": {}
+    }
 
 
 # Main function to run the workflow
 def create_hybrid_rm_proposal_analysis(
     company_name: str, 
     web_query: str,
-    use_vectorstore: bool = True
+    use_vectorstore: bool = True,
+    stream_output: bool = False,
+    metrics_path: str = None
 ):
     """
     Generate RM proposal analysis with product eligibility check
@@ -471,25 +1433,15 @@ def create_hybrid_rm_proposal_analysis(
         company_name: Name of the company to analyze
         web_query: Query for web search (Tavily)
         use_vectorstore: Whether to include internal document search
+        stream_output: Print and write the analysis as it is generated
+        metrics_path: Optional JSONL file to append the run's per-node metrics to
     """
     
     # Create the graph
     app = create_rm_proposal_graph()
     
     # Initial state
-    initial_state = {
-        "company_name": company_name,
-        "web_query": web_query,
-        "use_vectorstore": use_vectorstore,
-        "web_results": [],
-        "web_context": "",
-        "suggested_loan_products": [],
-        "product_info_docs": [],
-        "product_info_context": "",
-        "combined_context": "",
-        "analysis": "",
-        "error": ""
-    }
+    initial_state = build_initial_state(company_name, web_query, use_vectorstore, stream_output)
     
     # Run the workflow
     print("="*80)
@@ -498,6 +1450,52 @@ def create_hybrid_rm_proposal_analysis(
     
     final_state = app.invoke(initial_state)
     
+    if metrics_path:
+        emit_run_metrics(final_state, metrics_path)
+    
+    return (
+        final_state['analysis'], 
+        final_state['web_results'], 
+        final_state['suggested_loan_products'],
+        final_state['product_info_docs']
+    )
+
+
+async def acreate_hybrid_rm_proposal_analysis(
+    company_name: str, 
+    web_query: str,
+    use_vectorstore: bool = True,
+    app=None,
+    stream_output: bool = False,
+    metrics_path: str = None
+):
+    """
+    Async version of ``create_hybrid_rm_proposal_analysis``
+    
+    Args:
+        company_name: Name of the company to analyze
+        web_query: Query for web search (Tavily)
+        use_vectorstore: Whether to include internal document search
+        app: Graph compiled with ``create_rm_proposal_graph(async_nodes=True)``;
+            pass one in to share it across many concurrent runs
+        stream_output: Print and write the analysis as it is generated
+        metrics_path: Optional JSONL file to append the run's per-node metrics to
+    """
+    
+    if app is None:
+        app = create_rm_proposal_graph(async_nodes=True)
+    
+    initial_state = build_initial_state(company_name, web_query, use_vectorstore, stream_output)
+    
+    print("="*80)
+    print(f"🚀 STARTING RM ELIGIBILITY ANALYSIS: {company_name}")
+    print("="*80 + "\n")
+    
+    final_state = await app.ainvoke(initial_state)
+    
+    if metrics_path:
+        await asyncio.to_thread(emit_run_metrics, final_state, metrics_path)
+    
     return (
         final_state['analysis'], 
         final_state['web_results'], 
@@ -516,7 +1514,7 @@ if __name__ == "__main__":
     print("="*80)
     print("INITIAL SETUP: Loading Internal Documents")
     print("="*80)
-    rag_system.create_vectorstore(directory_path="./my_documents")
+    get_rag_system().create_vectorstore(directory_path="./my_documents")
     print("\n")
     """
     
@@ -534,7 +1532,7 @@ if __name__ == "__main__":
         exit(1)
     
     # Auto-generate web query based on company name
-    web_query = f"{company} Malaysia news financial performance expansion plans 2024 2025"
+    web_query = default_web_query(company)
     
     print(f"\n🔍 Web Search Query: {web_query}")
     
@@ -553,19 +1551,16 @@ if __name__ == "__main__":
     print("Starting analysis...")
     print("="*80 + "\n")
     
-    # Run analysis
+    # Run analysis (streamed to the console as it is generated)
     analysis, web_sources, loan_products, product_docs = create_hybrid_rm_proposal_analysis(
         company_name=company,
         web_query=web_query,
-        use_vectorstore=use_vectorstore
+        use_vectorstore=use_vectorstore,
+        stream_output=True
     )
     
     # Display results
     print("\n" + "="*80)
-    print(f"RM ELIGIBILITY ANALYSIS: {company}")
-    print("="*80)
-    print(analysis)
-    print("\n" + "="*80)
     
     # Show sources
     print(f"\n📰 Web Sources: {len(web_sources)}")
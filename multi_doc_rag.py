@@ -1,23 +1,39 @@
 import os
+import re
+import json
+import ntpath
+import fnmatch
+import functools
+import importlib
+import inspect
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, date
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, TypedDict
 from dotenv import load_dotenv
 
 # ✅ Text splitter (moved from langchain to langchain_text_splitters)
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-# ✅ Vector store (modularized)
-from langchain_chroma import Chroma
-# ✅ Document loaders (moved to langchain_community)
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    Docx2txtLoader,
-    UnstructuredExcelLoader,
-    CSVLoader,
-    TextLoader,
-    UnstructuredPowerPointLoader,
-)
+# ✅ Vector store (langchain_chroma) and document loaders (langchain_community)
+# are imported on first use, so query-only processes never load the parsers
 # ✅ Document schema (moved to langchain_core)
 from langchain_core.documents import Document
+# ✅ Embeddings interface (for the caching wrapper)
+from langchain_core.embeddings import Embeddings
+# ✅ Retriever interface (for the hybrid retriever)
+from langchain_core.retrievers import BaseRetriever
+
+from bm25_index import BM25Index
+from call_counts import count_call
+from product_index import ProductIndex, document_type_from_source, product_name_from_source
+from rate_limit import RateLimiter, RateLimitedEmbeddings
 
 # Import your embedding model
 # from src.models.model import embed_model
@@ -25,31 +41,501 @@ from langchain_core.documents import Document
 load_dotenv()
 
 
+class FileInfo(TypedDict):
+    """One entry of the file manifest returned by scan_directory()."""
+    path: Path
+    size: int
+    mtime: float
+    file_type: str
+
+
+def _chroma():
+    """The Chroma vector store class (imported on first use)"""
+    from langchain_chroma import Chroma
+    return Chroma
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_loader_name(name: str):
+    module, _, attr = name.rpartition(":")
+    return getattr(importlib.import_module(module or "langchain_community.document_loaders"), attr)
+
+
+def _resolve_loader(loader):
+    """
+    Loader factory for a registry entry.
+    
+    Entries are a loader class or other callable taking the file path, a
+    langchain_community.document_loaders class name ("PyPDFLoader"), or a
+    "module:attribute" path for loaders from other packages. Names are
+    imported on first use and cached per process.
+    """
+    if isinstance(loader, str):
+        return _resolve_loader_name(loader)
+    return loader
+
+
+# PDF text extraction backends by short name (langchain_community loaders)
+PDF_BACKENDS = {
+    "pymupdf": "PyMuPDFLoader",
+    "pdfium": "PyPDFium2Loader",
+    "pypdf": "PyPDFLoader",
+}
+DEFAULT_PDF_BACKENDS = ("pymupdf", "pdfium", "pypdf")
+
+
+class FallbackPDFLoader:
+    """
+    PDF loader that streams pages from the first backend that can read the file.
+    
+    Backends (names from PDF_BACKENDS or loader names, see _resolve_loader)
+    are tried in order: one whose package is not installed, or that fails
+    on the file, hands over to the next, which resumes at the first page not
+    yet yielded. The default order puts the native PyMuPDF and pdfium
+    extractors ahead of PyPDF. Each page records its backend in
+    metadata["pdf_backend"]. Backends extract slightly different text, so
+    switching backends re-embeds the affected chunks on the next ingestion.
+    """
+    
+    def __init__(self, file_path: str, backends: Tuple[str, ...] = DEFAULT_PDF_BACKENDS):
+        self.file_path = str(file_path)
+        self.backends = tuple(backends)
+    
+    def lazy_load(self) -> Iterator[Document]:
+        yielded = 0
+        errors = []
+        
+        for backend in self.backends:
+            try:
+                loader = _resolve_loader(PDF_BACKENDS.get(backend, backend))(self.file_path)
+                for page, doc in enumerate(loader.lazy_load()):
+                    if page < yielded:
+                        continue
+                    doc.metadata["pdf_backend"] = backend
+                    yielded += 1
+                    yield doc
+                return
+            except ImportError:
+                errors.append(f"{backend}: not installed")
+            except Exception as e:
+                print(f"⚠️  {backend} failed on {Path(self.file_path).name} "
+                      f"after {yielded} page(s), falling back: {e}")
+                errors.append(f"{backend}: {e}")
+        
+        raise RuntimeError(f"No PDF backend could read the file ({'; '.join(errors)})")
+    
+    def load(self) -> List[Document]:
+        return list(self.lazy_load())
+
+
+def pdf_loader(*backends: str):
+    """
+    Loader for register_loader() that uses the given PDF backends in order.
+    
+    e.g. MultiDocumentRAG.register_loader(".pdf", pdf_loader("pdfium", "pypdf"))
+    """
+    return functools.partial(FallbackPDFLoader, backends=backends or DEFAULT_PDF_BACKENDS)
+
+
+# "Effective date: 1 March 2025", "Effective from 2025-03-01", ...
+_EFFECTIVE_DATE = re.compile(
+    r"effective\s+(?:date|from|as\s+(?:of|at))\s*[:\-]?\s*"
+    r"(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4}|\d{1,2}\s+[A-Za-z]+\s+\d{4}|[A-Za-z]+\s+\d{1,2},\s*\d{4})",
+    re.IGNORECASE
+)
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y")
+_PRODUCT_LINE = re.compile(r"^\s*Product\s*:\s*(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def _parse_date(text: str) -> Optional[str]:
+    """ISO date for a date written in one of _DATE_FORMATS or as PDF metadata"""
+    text = " ".join(text.split()).replace(" ,", ",")
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            pass
+    
+    # PDF metadata: ISO timestamps (pypdf) or "D:20251109142650+00'00'" (PyMuPDF)
+    match = re.match(r"(?:D:)?(\d{4})-?(\d{2})-?(\d{2})", text)
+    if match:
+        try:
+            return date(*map(int, match.groups())).isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+def _document_metadata(file_path: Path, documents: List[Document]) -> dict:
+    """
+    Structured metadata shared by every page of a file, for filtered retrieval.
+    
+    document_type and product_family come from the file name (product
+    sheets, see product_index.py), or product_family from a "Product: ..."
+    line on the first page. effective_date (YYYY-MM-DD) is taken from an
+    "Effective date: ..." line, else the PDF's modification/creation date;
+    files with neither get none, rather than a date that changes whenever
+    the file is copied or touched.
+    """
+    first_page = documents[0].page_content if documents else ""
+    
+    product_family = product_name_from_source(str(file_path))
+    if product_family is None:
+        match = _PRODUCT_LINE.search(first_page)
+        product_family = match.group(1) if match else None
+    
+    effective_date = None
+    match = _EFFECTIVE_DATE.search(" ".join(doc.page_content for doc in documents[:3]))
+    if match:
+        effective_date = _parse_date(match.group(1))
+    if effective_date is None and documents:
+        for key in ("moddate", "modDate", "creationdate", "creationDate"):
+            if documents[0].metadata.get(key):
+                effective_date = _parse_date(str(documents[0].metadata[key]))
+                if effective_date:
+                    break
+    
+    metadata = {"document_type": document_type_from_source(str(file_path))}
+    # Chroma metadata cannot hold None, so missing fields are left out
+    if product_family:
+        metadata["product_family"] = product_family
+    if effective_date:
+        metadata["effective_date"] = effective_date
+    return metadata
+
+
+def _load_file(file_path: str, loader) -> List[Document]:
+    """
+    Parse one file with its loader (see _resolve_loader) and tag its metadata
+    (source, file type and _document_metadata()).
+    
+    Module-level (not a method) so it can run in worker processes.
+    """
+    file_path = Path(file_path)
+    extension = file_path.suffix.lower()
+    loader_class = _resolve_loader(loader)
+    
+    try:
+        print(f"Loading {file_path.name}...")
+        
+        # Special handling for CSV files
+        if extension == '.csv':
+            loader = loader_class(file_path=str(file_path))
+        else:
+            loader = loader_class(str(file_path))
+        
+        documents = loader.load()
+        
+        # Add source and filtering metadata
+        metadata = _document_metadata(file_path, documents)
+        for doc in documents:
+            doc.metadata.update(metadata)
+            doc.metadata['source'] = str(file_path)
+            doc.metadata['file_type'] = extension
+        
+        print(f"✓ Loaded {len(documents)} document(s) from {file_path.name}")
+        return documents
+        
+    except Exception as e:
+        print(f"✗ Error loading {file_path.name}: {str(e)}")
+        return []
+
+
+# Task type Google's embedding models use for search queries (embed_query());
+# embed_documents() defaults to RETRIEVAL_DOCUMENT
+QUERY_TASK_TYPE = "RETRIEVAL_QUERY"
+
+
+def _accepts_task_type(embed_model) -> bool:
+    """True if embed_documents() takes a task_type, as GoogleGenerativeAIEmbeddings does"""
+    # Look through the rate limiting wrapper, which passes keyword arguments on
+    while isinstance(embed_model, RateLimitedEmbeddings):
+        embed_model = embed_model.embed_model
+    try:
+        return "task_type" in inspect.signature(embed_model.embed_documents).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def embed_queries(embed_model, texts: List[str]) -> List[List[float]]:
+    """
+    Embed several search queries as queries, not documents.
+    
+    Uses one batched embed_documents(task_type=RETRIEVAL_QUERY) call when the
+    model supports it and falls back to embed_query() per text otherwise.
+    """
+    if hasattr(embed_model, "embed_queries"):
+        return embed_model.embed_queries(texts)
+    if _accepts_task_type(embed_model):
+        count_call("embedding_calls")
+        return embed_model.embed_documents(texts, task_type=QUERY_TASK_TYPE)
+    count_call("embedding_calls", len(texts))
+    return [embed_model.embed_query(text) for text in texts]
+
+
+async def aembed_queries(embed_model, texts: List[str]) -> List[List[float]]:
+    """Async version of embed_queries()."""
+    if hasattr(embed_model, "aembed_queries"):
+        return await embed_model.aembed_queries(texts)
+    if _accepts_task_type(embed_model):
+        count_call("embedding_calls")
+        return await embed_model.aembed_documents(texts, task_type=QUERY_TASK_TYPE)
+    count_call("embedding_calls", len(texts))
+    return list(await asyncio.gather(*(embed_model.aembed_query(text) for text in texts)))
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding model wrapper with an in-memory LRU and an on-disk SQLite cache.
+    
+    Vectors are keyed by model name, embedding kind (document/query) and a
+    SHA-256 of the text, so only texts never seen before reach the
+    underlying embedding API.
+    """
+    
+    def __init__(
+        self,
+        embed_model,
+        cache_path: Optional[str] = None,
+        max_memory_items: int = 10000,
+        model_name: Optional[str] = None
+    ):
+        self.embed_model = embed_model
+        self.model_name = (
+            model_name
+            or getattr(embed_model, "model", None)
+            or type(embed_model).__name__
+        )
+        self.cache_path = cache_path
+        self.max_memory_items = max_memory_items
+        self.hits = 0
+        self.misses = 0
+        
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+            )
+            self._conn.commit()
+    
+    def _key(self, text: str, kind: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+    
+    def _lookup(self, keys: List[str]) -> dict:
+        """Return cached vectors for the given keys (memory first, then disk)."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            
+            missing = [key for key in keys if key not in found]
+            if missing and self._conn is not None:
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = array("d", blob).tolist()
+                        self._remember(key, found[key])
+        
+        return found
+    
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+    
+    def _store(self, items: dict):
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            
+            if self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("d", vector).tobytes()) for key, vector in items.items()],
+                )
+                self._conn.commit()
+    
+    def _split(self, texts: List[str], kind: str):
+        """Split texts into cached vectors and the unique texts still to embed."""
+        keys = [self._key(text, kind) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        
+        to_embed = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                to_embed.setdefault(key, text)
+        
+        with self._lock:
+            self.hits += len(texts) - len(to_embed)
+            self.misses += len(to_embed)
+        count_call("embedding_cache_hits", len(texts) - len(to_embed))
+        
+        return keys, found, to_embed
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, to_embed = self._split(texts, "document")
+        
+        if to_embed:
+            vectors = self.embed_model.embed_documents(list(to_embed.values()))
+            new_items = dict(zip(to_embed.keys(), vectors))
+            self._store(new_items)
+            found.update(new_items)
+        
+        return [found[key] for key in keys]
+    
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, to_embed = self._split([text], "query")
+        
+        if to_embed:
+            found[keys[0]] = self.embed_model.embed_query(text)
+            self._store({keys[0]: found[keys[0]]})
+        
+        return found[keys[0]]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, to_embed = await asyncio.to_thread(self._split, texts, "document")
+        
+        if to_embed:
+            vectors = await self.embed_model.aembed_documents(list(to_embed.values()))
+            new_items = dict(zip(to_embed.keys(), vectors))
+            await asyncio.to_thread(self._store, new_items)
+            found.update(new_items)
+        
+        return [found[key] for key in keys]
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, to_embed = await asyncio.to_thread(self._split, [text], "query")
+        
+        if to_embed:
+            found[keys[0]] = await self.embed_model.aembed_query(text)
+            await asyncio.to_thread(self._store, {keys[0]: found[keys[0]]})
+        
+        return found[keys[0]]
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batched embed_query(), cached under the same keys (see embed_queries())."""
+        keys, found, to_embed = self._split(texts, "query")
+        
+        if to_embed:
+            vectors = embed_queries(self.embed_model, list(to_embed.values()))
+            new_items = dict(zip(to_embed.keys(), vectors))
+            self._store(new_items)
+            found.update(new_items)
+        
+        return [found[key] for key in keys]
+    
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        keys, found, to_embed = await asyncio.to_thread(self._split, texts, "query")
+        
+        if to_embed:
+            vectors = await aembed_queries(self.embed_model, list(to_embed.values()))
+            new_items = dict(zip(to_embed.keys(), vectors))
+            await asyncio.to_thread(self._store, new_items)
+            found.update(new_items)
+        
+        return [found[key] for key in keys]
+    
+    def cache_stats(self) -> dict:
+        """Return hit/miss counters for this process."""
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class HybridRetriever(BaseRetriever):
+    """LangChain retriever over MultiDocumentRAG's fused vector + BM25 search."""
+    
+    rag: Any
+    k: int = 5
+    where: Optional[dict] = None
+    
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.rag.query_many([query], k=self.k, where=self.where)[0]
+    
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return (await self.rag.aquery_many([query], k=self.k, where=self.where))[0]
+
+
+# Chunk IDs assigned by _assign_chunk_ids (SHA-256 hex digests)
+_CONTENT_HASH_ID = re.compile(r"[0-9a-f]{64}")
+
+
 class MultiDocumentRAG:
     """RAG system that handles multiple document types."""
     
+    # Loader registry by extension. Entries are names (see _resolve_loader), so
+    # a parser is only imported when a file of that type is loaded; add or
+    # override types with register_loader(). PDFs go through the fastest
+    # installed backend (see FallbackPDFLoader and pdf_loader())
     SUPPORTED_EXTENSIONS = {
-        '.pdf': PyPDFLoader,
-        '.docx': Docx2txtLoader,
-        '.doc': Docx2txtLoader,
-        '.xlsx': UnstructuredExcelLoader,
-        '.xls': UnstructuredExcelLoader,
-        '.csv': CSVLoader,
-        '.txt': TextLoader,
-        '.md': TextLoader,
-        '.pptx': UnstructuredPowerPointLoader,
-        '.ppt': UnstructuredPowerPointLoader,
+        '.pdf': FallbackPDFLoader,
+        '.docx': "Docx2txtLoader",
+        '.doc': "Docx2txtLoader",
+        '.xlsx': "UnstructuredExcelLoader",
+        '.xls': "UnstructuredExcelLoader",
+        '.csv': "CSVLoader",
+        '.txt': "TextLoader",
+        '.md': "TextLoader",
+        '.pptx': "UnstructuredPowerPointLoader",
+        '.ppt': "UnstructuredPowerPointLoader",
     }
     
+    # Ingestion manifest, product index and BM25 index kept inside the Chroma directory
+    MANIFEST_FILENAME = "ingest_manifest.json"
+    # Bumped when loading adds or changes chunk metadata; files ingested under
+    # an older version are re-ingested (2: document_type, product_family and
+    # effective_date metadata; 3: no file mtime as effective_date)
+    MANIFEST_SCHEMA_VERSION = 3
+    # Minimum seconds between manifest saves while files are being ingested
+    MANIFEST_SAVE_INTERVAL = 5.0
+    PRODUCT_INDEX_FILENAME = "product_index.json"
+    BM25_INDEX_FILENAME = "bm25_index.sqlite3"
+    
+    # Hybrid search: candidates taken from each ranking per result, and the
+    # reciprocal rank fusion constant
+    HYBRID_CANDIDATES_PER_RESULT = 4
+    RRF_K = 60
+    
     def __init__(
         self, 
         embed_model,
         chroma_path: str = "./chroma_langchain_db",
         collection_name: str = "multi-doc-rag",
         chunk_size: int = 500,
-        chunk_overlap: int = 50
+        chunk_overlap: int = 50,
+        cache_embeddings: bool = True,
+        embedding_cache_path: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None
     ):
-        """Initialize the RAG system."""
+        """
+        Initialize the RAG system.
+        
+        With a rate_limiter, calls to embed_model are throttled and transient
+        errors retried (see rate_limit.RateLimitedEmbeddings). Unless
+        cache_embeddings is False, embed_model is then wrapped in
+        CachedEmbeddings backed by embedding_cache_path (default:
+        "<chroma_path>_embedding_cache.sqlite3" next to the vector store), so
+        cache hits do not count against the limits.
+        """
+        if rate_limiter is not None:
+            embed_model = RateLimitedEmbeddings(embed_model, rate_limiter)
+        
+        if cache_embeddings and not isinstance(embed_model, CachedEmbeddings):
+            if embedding_cache_path is None:
+                embedding_cache_path = chroma_path.rstrip("/\\") + "_embedding_cache.sqlite3"
+            embed_model = CachedEmbeddings(embed_model, cache_path=embedding_cache_path)
+        
         self.embed_model = embed_model
         self.chroma_path = chroma_path
         self.collection_name = collection_name
@@ -61,11 +547,42 @@ class MultiDocumentRAG:
             chunk_overlap=chunk_overlap,
             length_function=len,
         )
+        
+        # Vector store and retrievers are opened once and reused across queries;
+        # create_vectorstore() and delete_vectorstore() reset them
+        self._vectorstore = None
+        self._retrievers = {}
+        self._product_index = None
+        self._bm25_index = None
+        self._vectorstore_lock = threading.RLock()
     
-    def load_document(self, file_path: str) -> List[Document]:
-        """Load a single document based on its file extension."""
-        file_path = Path(file_path)
+    @classmethod
+    def register_loader(cls, extensions, loader):
+        """
+        Register the loader for one or more file extensions, e.g.
+        register_loader([".html", ".htm"], "BSHTMLLoader") (needs beautifulsoup4)
+        or register_loader(".eml", "UnstructuredEmailLoader") (needs unstructured).
+        
+        loader is a loader class or callable taking the file path, a
+        langchain_community.document_loaders class name, or a
+        "module:attribute" path; names are only imported when a matching file
+        is loaded. Registering on a subclass leaves the base class untouched.
+        For workers > 1, loaders passed as objects must be picklable (defined
+        at module level).
+        """
+        if isinstance(extensions, str):
+            extensions = [extensions]
         
+        registry = dict(cls.SUPPORTED_EXTENSIONS)
+        for extension in extensions:
+            extension = extension.lower()
+            if not extension.startswith("."):
+                extension = "." + extension
+            registry[extension] = loader
+        cls.SUPPORTED_EXTENSIONS = registry
+    
+    def _loader_for(self, file_path: Path):
+        """Return the loader registry entry for a file, validating it first."""
         if not file_path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
         
@@ -77,47 +594,128 @@ class MultiDocumentRAG:
                 f"Supported types: {list(self.SUPPORTED_EXTENSIONS.keys())}"
             )
         
-        loader_class = self.SUPPORTED_EXTENSIONS[extension]
+        return self.SUPPORTED_EXTENSIONS[extension]
+    
+    def load_document(self, file_path: str) -> List[Document]:
+        """Load a single document based on its file extension."""
+        file_path = Path(file_path)
+        return _load_file(str(file_path), self._loader_for(file_path))
+    
+    def iter_load_documents(
+        self,
+        file_paths: Iterable,
+        workers: int = 1
+    ) -> Iterator[Tuple[Path, List[Document]]]:
+        """
+        Load files and yield (path, documents) as each file finishes.
+        
+        With workers > 1 the files are parsed in a process pool; at most
+        2 * workers files are in flight, so results stream back instead of
+        piling up. Results then arrive in completion order, not input order.
+        On Windows, call this from under an `if __name__ == "__main__":` guard.
+        """
+        file_paths = [Path(path) for path in file_paths]
         
-        try:
-            print(f"Loading {file_path.name}...")
-            
-            # Special handling for CSV files
-            if extension == '.csv':
-                loader = loader_class(file_path=str(file_path))
-            else:
-                loader = loader_class(str(file_path))
-            
-            documents = loader.load()
+        if workers <= 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                yield file_path, self.load_document(str(file_path))
+            return
+        
+        jobs = iter([(path, self._loader_for(path)) for path in file_paths])
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {}
             
-            # Add source metadata
-            for doc in documents:
-                doc.metadata['source'] = str(file_path)
-                doc.metadata['file_type'] = extension
+            def submit_next():
+                for file_path, loader in jobs:
+                    future = executor.submit(_load_file, str(file_path), loader)
+                    pending[future] = file_path
+                    return
             
-            print(f"✓ Loaded {len(documents)} document(s) from {file_path.name}")
-            return documents
+            for _ in range(workers * 2):
+                submit_next()
             
-        except Exception as e:
-            print(f"✗ Error loading {file_path.name}: {str(e)}")
-            return []
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = pending.pop(future)
+                    submit_next()
+                    yield file_path, future.result()
     
-    def load_directory(self, directory_path: str) -> List[Document]:
-        """Load all supported documents from a directory."""
+    def scan_directory(
+        self,
+        directory_path: str,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> List[FileInfo]:
+        """
+        Walk a directory tree once and list every supported file.
+        
+        Files are matched on their lower-cased suffix, so ".PDF" is picked
+        up like ".pdf". include/exclude are glob patterns (e.g. "*.pdf",
+        "archive/*") tested against both the file name and the path relative
+        to the directory; with include set, a file must match one of them.
+        Returns path, size, mtime and file type per file, which is enough to
+        plan batched or parallel ingestion without touching the files again.
+        """
         directory = Path(directory_path)
         
         if not directory.exists():
             raise FileNotFoundError(f"Directory not found: {directory}")
         
+        def matches(name: str, relative: str, patterns: List[str]) -> bool:
+            return any(
+                fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern)
+                for pattern in patterns
+            )
+        
+        files = []
+        for root, dirs, names in os.walk(directory):
+            dirs.sort()
+            for name in sorted(names):
+                extension = os.path.splitext(name)[1].lower()
+                if extension not in self.SUPPORTED_EXTENSIONS:
+                    continue
+                
+                file_path = Path(root) / name
+                relative = file_path.relative_to(directory).as_posix()
+                if include and not matches(name, relative, include):
+                    continue
+                if exclude and matches(name, relative, exclude):
+                    continue
+                
+                stat = file_path.stat()
+                files.append({
+                    "path": file_path,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "file_type": extension,
+                })
+        
+        return files
+    
+    def find_files(
+        self,
+        directory_path: str,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> List[Path]:
+        """List all supported files in a directory (recursively)."""
+        return [info["path"] for info in self.scan_directory(directory_path, include, exclude)]
+    
+    def load_directory(
+        self,
+        directory_path: str,
+        workers: int = 1,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> List[Document]:
+        """Load all supported documents from a directory (workers > 1 parses in parallel)."""
         all_documents = []
         
-        # Find all supported files
-        for extension in self.SUPPORTED_EXTENSIONS.keys():
-            files = list(directory.glob(f"**/*{extension}"))
-            
-            for file_path in files:
-                docs = self.load_document(str(file_path))
-                all_documents.extend(docs)
+        file_paths = self.find_files(directory_path, include, exclude)
+        for _, docs in self.iter_load_documents(file_paths, workers):
+            all_documents.extend(docs)
         
         print(f"\n📚 Total documents loaded: {len(all_documents)}")
         return all_documents
@@ -126,88 +724,575 @@ class MultiDocumentRAG:
         self, 
         documents: Optional[List[Document]] = None,
         document_paths: Optional[List[str]] = None,
-        directory_path: Optional[str] = None
+        directory_path: Optional[str] = None,
+        workers: int = 1,
+        batch_size: int = 64,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
     ):
-        """Create or update vector store with documents."""
+        """
+        Create or update vector store with documents.
         
-        # Determine document source
-        if documents is None:
-            documents = []
-            
-            if document_paths:
-                for path in document_paths:
-                    docs = self.load_document(path)
-                    documents.extend(docs)
-            
-            elif directory_path:
-                documents = self.load_directory(directory_path)
-            
-            else:
-                raise ValueError(
-                    "Must provide either 'documents', 'document_paths', or 'directory_path'"
-                )
+        Ingestion is incremental and content-addressed: every chunk gets a
+        stable ID from its file's path (relative to the directory holding
+        the store, see _manifest_key) and content hash, and a manifest of
+        file hashes records what has been ingested. Only new or changed
+        files are loaded and embedded; chunks of changed files that no longer
+        exist (and, for directory_path, of deleted files) are removed.
         
-        if not documents:
-            raise ValueError("No documents to process")
+        Files are streamed through load -> split -> embed -> upsert with
+        batch_size chunks per embedding call, and progress is saved as it
+        goes, so large libraries ingest in bounded memory and interrupted
+        runs resume (see _ingest_files). workers > 1 parses the changed
+        files in a process pool (see iter_load_documents). include/exclude
+        filter directory_path the same way as scan_directory().
+        """
         
-        # Split documents
-        print("\n✂️  Splitting documents into chunks...")
-        doc_splits = self.text_splitter.split_documents(documents)
-        print(f"✓ Created {len(doc_splits)} chunks")
+        if documents is not None:
+            if not documents:
+                raise ValueError("No documents to process")
+            return self._ingest_documents(documents, batch_size=batch_size)
+        
+        if document_paths:
+            return self._ingest_files(
+                [Path(path) for path in document_paths],
+                workers=workers,
+                batch_size=batch_size
+            )
+        
+        if directory_path:
+            return self._ingest_files(
+                self.find_files(directory_path, include, exclude),
+                removal_scope=Path(directory_path).resolve(),
+                workers=workers,
+                batch_size=batch_size
+            )
+        
+        raise ValueError(
+            "Must provide either 'documents', 'document_paths', or 'directory_path'"
+        )
+    
+    @property
+    def manifest_path(self) -> str:
+        """Path of the ingestion manifest stored alongside the vector store."""
+        return os.path.join(self.chroma_path, self.MANIFEST_FILENAME)
+    
+    def _load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {"files": {}}
+        
+        with open(self.manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
         
-        # Check if vectorstore exists
+        # Manifests written before keys were relative used absolute paths
+        manifest["files"] = {
+            self._manifest_key(Path(key)) if os.path.isabs(key) else key: entry
+            for key, entry in manifest["files"].items()
+        }
+        return manifest
+    
+    def _store_root(self) -> Path:
+        """Directory holding the vector store, which manifest keys are relative to."""
+        return Path(self.chroma_path).resolve().parent
+    
+    def _manifest_key(self, file_path: Path) -> str:
+        """
+        Manifest key and chunk ID prefix of a file.
+        
+        The path relative to the directory holding the store, so moving the
+        project together with its store (or opening it under another user's
+        path) leaves every key, and so every chunk ID, unchanged.
+        """
+        path = file_path.resolve()
+        try:
+            return Path(os.path.relpath(path, self._store_root())).as_posix()
+        except ValueError:
+            # On another drive than the store (Windows)
+            return str(path)
+    
+    def _key_path(self, key: str) -> Path:
+        """Absolute path of the file a manifest key refers to."""
+        return (self._store_root() / key).resolve()
+    
+    def _save_manifest(self, manifest: dict):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    @staticmethod
+    def _fingerprint(file_path: Path, previous: Optional[dict] = None) -> dict:
+        """Size, mtime and SHA-256 of a file (hash reused if size/mtime match)."""
+        stat = file_path.stat()
+        
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+            sha256 = previous["sha256"]
+        else:
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            sha256 = digest.hexdigest()
+        
+        return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+    
+    @staticmethod
+    def _legacy_chunks_by_name(vectorstore) -> dict:
+        """
+        Chunks stored before the manifest existed, by lower-cased file name.
+        
+        Those chunks have random IDs rather than content hashes, and their
+        source may be a path from another machine (e.g. C:\\Users\\...), so
+        they are matched to files by name only.
+        """
+        stored = vectorstore._collection.get(include=["metadatas"])
+        legacy = {}
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            if _CONTENT_HASH_ID.fullmatch(chunk_id):
+                continue
+            name = ntpath.basename((metadata or {}).get("source", "")).lower()
+            legacy.setdefault(name, []).append(chunk_id)
+        return legacy
+    
+    @staticmethod
+    def _assign_chunk_ids(source_key: str, chunks: List[Document]):
+        """Give chunks stable IDs from source + content hash, dropping duplicates."""
+        ids, unique_chunks = [], []
+        seen = set()
+        
+        for chunk in chunks:
+            chunk_id = hashlib.sha256(
+                f"{source_key}\0{chunk.page_content}".encode("utf-8")
+            ).hexdigest()
+            
+            if chunk_id not in seen:
+                seen.add(chunk_id)
+                ids.append(chunk_id)
+                unique_chunks.append(chunk)
+        
+        return ids, unique_chunks
+    
+    def _open_or_create_vectorstore(self):
+        """Return the vector store, creating an empty one if needed."""
         if os.path.exists(self.chroma_path):
             print(f"\n📦 Loading existing vector store from {self.chroma_path}...")
-            vectorstore = Chroma(
+            return self.load_vectorstore()
+        
+        print(f"\n🆕 Creating new vector store at {self.chroma_path}...")
+        with self._vectorstore_lock:
+            self._vectorstore = _chroma()(
                 persist_directory=self.chroma_path,
                 embedding_function=self.embed_model,
                 collection_name=self.collection_name,
             )
+            return self._vectorstore
+    
+    def _add_new_chunks(
+        self,
+        vectorstore,
+        ids: List[str],
+        chunks: List[Document],
+        batch_size: int = 64
+    ) -> int:
+        """
+        Embed and add only chunks whose IDs are not already stored, batch by batch.
+        
+        The BM25 index gets every chunk it does not have yet, including ones
+        already in Chroma, so it catches up after an interrupted run.
+        """
+        added = 0
+        bm25_index = self.get_bm25_index()
+        
+        for start in range(0, len(ids), batch_size):
+            batch_ids = ids[start:start + batch_size]
+            batch_chunks = chunks[start:start + batch_size]
             
-            # Add new documents
-            print("➕ Adding new documents to existing vector store...")
-            vectorstore.add_documents(doc_splits)
-        else:
-            print(f"\n🆕 Creating new vector store at {self.chroma_path}...")
-            vectorstore = Chroma.from_documents(
-                documents=doc_splits,
-                collection_name=self.collection_name,
-                embedding=self.embed_model,
-                persist_directory=self.chroma_path,
+            existing = set(vectorstore.get(ids=batch_ids, include=[])["ids"])
+            new_pairs = [(i, c) for i, c in zip(batch_ids, batch_chunks) if i not in existing]
+            
+            if new_pairs:
+                new_ids, new_chunks = zip(*new_pairs)
+                vectorstore.add_documents(list(new_chunks), ids=list(new_ids))
+                added += len(new_pairs)
+            
+            bm25_index.add(
+                batch_ids,
+                [chunk.page_content for chunk in batch_chunks],
+                [chunk.metadata for chunk in batch_chunks]
             )
         
+        return added
+    
+    def _delete_chunks(self, vectorstore, ids: List[str]):
+        """Remove chunks from the vector store and the BM25 index."""
+        if ids:
+            # Open (or build) the BM25 index first so a fresh build still sees these chunks
+            bm25_index = self.get_bm25_index()
+            vectorstore.delete(ids=ids)
+            bm25_index.delete(ids)
+    
+    def _ingest_documents(self, documents: List[Document], batch_size: int = 64):
+        """Split and add already-loaded documents, skipping known chunks."""
+        # Split documents
+        print("\n✂️  Splitting documents into chunks...")
+        ids, doc_splits = [], []
+        for doc in documents:
+            chunk_ids, chunks = self._assign_chunk_ids(
+                doc.metadata.get("source", ""),
+                self.text_splitter.split_documents([doc])
+            )
+            ids.extend(chunk_ids)
+            doc_splits.extend(chunks)
+        
+        # Identical chunks across documents collapse onto one ID
+        unique = dict(zip(ids, doc_splits))
+        ids, doc_splits = list(unique.keys()), list(unique.values())
+        print(f"✓ Created {len(doc_splits)} chunks")
+        
+        with self._vectorstore_lock:
+            vectorstore = self._open_or_create_vectorstore()
+            added = self._add_new_chunks(vectorstore, ids, doc_splits, batch_size)
+            print(f"➕ Added {added} new chunk(s), skipped {len(ids) - added} already stored")
+            
+            # Contents changed, so drop cached retrievers and keep the new handle
+            self._reset_vectorstore_cache()
+            self._vectorstore = vectorstore
+            self.build_product_index()
+        
+        print("✅ Vector store ready!")
+        return vectorstore
+    
+    def _ingest_files(
+        self,
+        file_paths: List[Path],
+        removal_scope: Optional[Path] = None,
+        workers: int = 1,
+        batch_size: int = 64
+    ):
+        """
+        Incrementally ingest files as a streaming pipeline.
+        
+        Files are loaded one at a time (or a few at a time with workers > 1),
+        split, and their chunks embedded and upserted in batches of
+        batch_size, so memory stays bounded by one file plus one batch. A
+        file is recorded in the manifest once all its chunks are stored, and
+        the manifest is saved as files finish (at most every
+        MANIFEST_SAVE_INTERVAL seconds, and at the end): an interrupted job
+        picks up where it stopped, and chunks it already stored are not
+        re-embedded, even for files finished after the last save.
+        """
+        store_exists = os.path.exists(self.chroma_path)
+        
+        if store_exists and not os.path.exists(self.manifest_path):
+            # Store built before the manifest existed: its chunks have random IDs
+            manifest = {"files": {}, "legacy_cleanup": True}
+        else:
+            manifest = self._load_manifest() if store_exists else {"files": {}}
+        known_files = manifest["files"]
+        
+        # Work out which files are new, changed, outdated or removed
+        changed, current_keys = [], set()
+        outdated = []
+        touched = False
+        for file_path in file_paths:
+            if not file_path.exists():
+                raise FileNotFoundError(f"File not found: {file_path}")
+            
+            key = self._manifest_key(file_path)
+            current_keys.add(key)
+            fingerprint = self._fingerprint(file_path, known_files.get(key))
+            
+            if known_files.get(key, {}).get("sha256") != fingerprint["sha256"]:
+                changed.append((key, file_path, fingerprint))
+            elif known_files[key].get("schema_version", 1) < self.MANIFEST_SCHEMA_VERSION:
+                # Same content but chunks lack newer metadata
+                changed.append((key, file_path, fingerprint))
+                outdated.append(key)
+            elif known_files[key]["mtime"] != fingerprint["mtime"]:
+                # Touched but identical content: remember the new mtime only
+                known_files[key].update(fingerprint)
+                touched = True
+        
+        # Only files gone from disk count as removed, not ones filtered out
+        missing = [
+            key for key in known_files
+            if key not in current_keys and not self._key_path(key).exists()
+        ]
+        removed = []
+        if removal_scope is not None:
+            removed = [key for key in missing if self._key_path(key).is_relative_to(removal_scope)]
+        
+        # A missing file whose content is being ingested under another key was
+        # moved (e.g. with the store, from an absolute-key manifest): drop its
+        # old entry so the chunks are not stored twice
+        changed_hashes = {fingerprint["sha256"] for _, _, fingerprint in changed}
+        removed += [
+            key for key in missing
+            if key not in removed and known_files[key].get("sha256") in changed_hashes
+        ]
+        
+        if not changed and not removed:
+            if not store_exists:
+                raise ValueError("No documents to process")
+            if touched:
+                self._save_manifest(manifest)
+            print("✅ Vector store is up to date - no new, changed or removed files")
+            return self.load_vectorstore()
+        
+        print(f"\n🔄 {len(changed) - len(outdated)} new/changed, {len(outdated)} outdated, "
+              f"{len(removed)} removed, {len(current_keys) - len(changed)} unchanged file(s)")
+        
+        with self._vectorstore_lock:
+            vectorstore = self._open_or_create_vectorstore()
+            
+            # Drop chunks of deleted files first, and of outdated files since
+            # their re-ingested chunks keep the same IDs
+            stale_ids = [
+                chunk_id for key in removed + outdated for chunk_id in known_files[key]["chunk_ids"]
+            ]
+            self._delete_chunks(vectorstore, stale_ids)
+            for key in removed + outdated:
+                del known_files[key]
+            self._save_manifest(manifest)
+            
+            totals = {"chunks": 0, "added": 0, "stale": len(stale_ids)}
+            
+            # Chunks of a store built before the manifest are replaced file by
+            # file as the files are re-ingested
+            legacy = self._legacy_chunks_by_name(vectorstore) if manifest.get("legacy_cleanup") else {}
+            pending_ids, pending_chunks = [], []
+            finished_files = []  # all chunks queued, waiting for the next flush
+            
+            last_save = [time.monotonic()]
+            
+            def flush(final: bool = False):
+                totals["added"] += self._add_new_chunks(
+                    vectorstore, pending_ids, pending_chunks, batch_size
+                )
+                if pending_ids:
+                    print(f"   ↳ Stored batch of {len(pending_ids)} chunk(s) "
+                          f"({totals['chunks']} so far)")
+                pending_ids.clear()
+                pending_chunks.clear()
+                
+                for key, fingerprint, chunk_ids in finished_files:
+                    # Remove chunks the new version of the file no longer has
+                    old_ids = set(known_files.get(key, {}).get("chunk_ids", []))
+                    obsolete = list(old_ids - set(chunk_ids))
+                    self._delete_chunks(vectorstore, obsolete)
+                    totals["stale"] += len(obsolete)
+                    known_files[key] = {
+                        **fingerprint,
+                        "schema_version": self.MANIFEST_SCHEMA_VERSION,
+                        "chunk_ids": chunk_ids,
+                    }
+                
+                # The manifest holds every file's chunk IDs, so it is only
+                # rewritten when files finished, and not after every batch
+                if final or (finished_files and time.monotonic() - last_save[0] >= self.MANIFEST_SAVE_INTERVAL):
+                    self._save_manifest(manifest)
+                    last_save[0] = time.monotonic()
+                finished_files.clear()
+            
+            changed_by_path = {file_path: (key, fingerprint) for key, file_path, fingerprint in changed}
+            for file_path, documents in self.iter_load_documents(changed_by_path, workers):
+                key, fingerprint = changed_by_path[file_path]
+                if not documents:
+                    # Leave failed files out of the manifest so the next run retries them
+                    continue
+                
+                legacy_ids = legacy.pop(file_path.name.lower(), [])
+                self._delete_chunks(vectorstore, legacy_ids)
+                totals["stale"] += len(legacy_ids)
+                
+                chunk_ids, chunks = self._assign_chunk_ids(
+                    key, self.text_splitter.split_documents(documents)
+                )
+                del documents
+                totals["chunks"] += len(chunks)
+                
+                for chunk_id, chunk in zip(chunk_ids, chunks):
+                    pending_ids.append(chunk_id)
+                    pending_chunks.append(chunk)
+                    if len(pending_ids) >= batch_size:
+                        flush()
+                
+                finished_files.append((key, fingerprint, chunk_ids))
+            
+            if not legacy:
+                # Keep cleaning up on later runs while files are still to be re-ingested
+                manifest.pop("legacy_cleanup", None)
+            flush(final=True)
+            
+            print(f"➕ Added {totals['added']} new chunk(s) out of {totals['chunks']}, "
+                  f"removed {totals['stale']} stale chunk(s)")
+            
+            # Contents changed, so drop cached retrievers and keep the new handle
+            self._reset_vectorstore_cache()
+            self._vectorstore = vectorstore
+            self.build_product_index()
+        
         print("✅ Vector store ready!")
         return vectorstore
     
     def load_vectorstore(self):
-        """Load existing vector store."""
-        if not os.path.exists(self.chroma_path):
-            raise FileNotFoundError(
-                f"Vector store not found at {self.chroma_path}. "
-                "Please create it first using create_vectorstore()"
+        """Load existing vector store (opened once, then reused)."""
+        with self._vectorstore_lock:
+            if self._vectorstore is not None:
+                return self._vectorstore
+            
+            if not os.path.exists(self.chroma_path):
+                raise FileNotFoundError(
+                    f"Vector store not found at {self.chroma_path}. "
+                    "Please create it first using create_vectorstore()"
+                )
+            
+            print(f"📦 Loading vector store from {self.chroma_path}...")
+            self._vectorstore = _chroma()(
+                persist_directory=self.chroma_path,
+                embedding_function=self.embed_model,
+                collection_name=self.collection_name,
             )
+            
+            return self._vectorstore
+    
+    def _reset_vectorstore_cache(self):
+        """Forget the cached vector store, retrievers and product index."""
+        with self._vectorstore_lock:
+            self._vectorstore = None
+            self._retrievers = {}
+            self._product_index = None
+    
+    @property
+    def product_index_path(self) -> str:
+        return os.path.join(self.chroma_path, self.PRODUCT_INDEX_FILENAME)
+    
+    def build_product_index(self) -> ProductIndex:
+        """
+        Rebuild the product index from the product sheets in the vector store.
         
-        print(f"📦 Loading vector store from {self.chroma_path}...")
-        vectorstore = Chroma(
-            persist_directory=self.chroma_path,
-            embedding_function=self.embed_model,
-            collection_name=self.collection_name,
-        )
+        Runs at the end of every ingestion; call it directly to index a store
+        built before the index existed.
+        """
+        with self._vectorstore_lock:
+            collection = self.load_vectorstore()._collection
+            
+            # Only the product sheets' chunks are fetched with their text
+            stored = collection.get(include=["metadatas"])
+            sheet_ids = [
+                chunk_id for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])
+                if product_name_from_source((metadata or {}).get("source", ""))
+            ]
+            sheets = collection.get(ids=sheet_ids, include=["documents", "metadatas"]) \
+                if sheet_ids else {"ids": [], "documents": [], "metadatas": []}
+            
+            index = ProductIndex.from_chunks(sheets["ids"], sheets["documents"], sheets["metadatas"])
+            index.save(self.product_index_path)
+            self._product_index = index
+            
+            print(f"🗂️  Product index: {', '.join(index.products) or 'no product sheets'}")
+            return index
+    
+    def get_product_index(self) -> ProductIndex:
+        """Product index for the store (loaded once, built if missing)."""
+        with self._vectorstore_lock:
+            if self._product_index is None:
+                if os.path.exists(self.product_index_path):
+                    self._product_index = ProductIndex.load(self.product_index_path)
+                else:
+                    self._product_index = self.build_product_index()
+            
+            return self._product_index
+    
+    @property
+    def bm25_index_path(self) -> str:
+        return os.path.join(self.chroma_path, self.BM25_INDEX_FILENAME)
+    
+    def build_bm25_index(self) -> BM25Index:
+        """
+        Rebuild the BM25 index from every chunk in the vector store.
         
-        return vectorstore
+        Ingestion keeps the index up to date; this is only needed for a store
+        built before the index (or its current schema) existed, and
+        get_bm25_index() does it then.
+        """
+        with self._vectorstore_lock:
+            collection = self.load_vectorstore()._collection
+            if self._bm25_index is not None:
+                self._bm25_index.close()
+                self._bm25_index = None
+            
+            # Built under a temporary name so an interrupted build is not mistaken for a complete one
+            tmp_path = self.bm25_index_path + ".tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            index = BM25Index(tmp_path)
+            
+            ids = collection.get(include=[])["ids"]
+            for start in range(0, len(ids), 1000):
+                stored = collection.get(ids=ids[start:start + 1000], include=["documents", "metadatas"])
+                index.add(stored["ids"], stored["documents"], stored["metadatas"])
+            index.close()
+            
+            os.replace(tmp_path, self.bm25_index_path)
+            print(f"🔤 BM25 index: {len(ids)} chunk(s)")
+            self._bm25_index = BM25Index(self.bm25_index_path)
+            return self._bm25_index
     
-    def get_retriever(self, search_kwargs: dict = None):
-        """Get retriever from vector store."""
+    def get_bm25_index(self) -> BM25Index:
+        """BM25 index for the store (opened once, built if missing)."""
+        with self._vectorstore_lock:
+            if self._bm25_index is None:
+                if os.path.exists(self.bm25_index_path):
+                    self._bm25_index = BM25Index(self.bm25_index_path)
+                if self._bm25_index is None or self._bm25_index.needs_rebuild:
+                    self._bm25_index = self.build_bm25_index()
+            
+            return self._bm25_index
+    
+    def get_retriever(
+        self,
+        search_kwargs: dict = None,
+        hybrid: bool = False,
+        where: Optional[dict] = None
+    ):
+        """
+        Get retriever from vector store (cached per search_kwargs).
+        
+        With hybrid, the retriever fuses vector and BM25 results like
+        query_many() and only search_kwargs["k"] is used. where is a Chroma
+        metadata filter (see query_many()).
+        """
         if search_kwargs is None:
             search_kwargs = {"k": 5}  # Return top 5 results
+        if where is not None and not hybrid:
+            search_kwargs = {**search_kwargs, "filter": where}
         
-        vectorstore = self.load_vectorstore()
-        return vectorstore.as_retriever(search_kwargs=search_kwargs)
+        cache_key = json.dumps([search_kwargs, hybrid, where], sort_keys=True, default=str)
+        
+        with self._vectorstore_lock:
+            if cache_key not in self._retrievers:
+                vectorstore = self.load_vectorstore()
+                if hybrid:
+                    self._retrievers[cache_key] = HybridRetriever(
+                        rag=self, k=search_kwargs.get("k", 5), where=where
+                    )
+                else:
+                    self._retrievers[cache_key] = vectorstore.as_retriever(
+                        search_kwargs=search_kwargs
+                    )
+            
+            return self._retrievers[cache_key]
     
-    def query(self, question: str, k: int = 5) -> List[Document]:
-        """Query the vector store."""
-        vectorstore = self.load_vectorstore()
-        results = vectorstore.similarity_search(question, k=k)
+    def query(
+        self,
+        question: str,
+        k: int = 5,
+        hybrid: bool = True,
+        where: Optional[dict] = None
+    ) -> List[Document]:
+        """Query the vector store (fused with BM25 unless hybrid is False)."""
+        results = self.query_many([question], k=k, hybrid=hybrid, where=where)[0]
         
         print(f"\n🔍 Found {len(results)} relevant chunks:")
         for i, doc in enumerate(results, 1):
@@ -216,9 +1301,167 @@ class MultiDocumentRAG:
         
         return results
     
+    def query_many(
+        self,
+        questions: List[str],
+        k: int = 5,
+        hybrid: bool = True,
+        where: Optional[dict] = None
+    ) -> List[List[Document]]:
+        """
+        Query the vector store with several questions at once.
+        
+        All questions are embedded in one batched query embedding call (see
+        embed_queries()) and
+        answered by a single multi-query lookup on the Chroma collection.
+        With hybrid (the default), the vector ranking is fused with a BM25
+        ranking of the same questions (see _fuse_rankings), so exact product
+        and criterion names are found at small k.
+        
+        where is a Chroma metadata filter that limits both searches to
+        matching chunks, e.g. {"product_family": "Term Loan"} or
+        {"document_type": {"$in": ["eligibility_criteria", "product_info_sheet"]}}
+        (see _document_metadata for the fields set at ingestion).
+        Returns one list of documents per question, in input order.
+        """
+        if not questions:
+            return []
+        
+        vectorstore = self.load_vectorstore()
+        query_embeddings = embed_queries(self.embed_model, questions)
+        return self._search(vectorstore, questions, query_embeddings, k, hybrid, where)
+    
+    async def aquery_many(
+        self,
+        questions: List[str],
+        k: int = 5,
+        hybrid: bool = True,
+        where: Optional[dict] = None
+    ) -> List[List[Document]]:
+        """Async version of query_many()."""
+        if not questions:
+            return []
+        
+        vectorstore = self.load_vectorstore()
+        query_embeddings = await aembed_queries(self.embed_model, questions)
+        return await asyncio.to_thread(
+            self._search, vectorstore, questions, query_embeddings, k, hybrid, where
+        )
+    
+    def _search(
+        self,
+        vectorstore,
+        questions: List[str],
+        query_embeddings,
+        k: int,
+        hybrid: bool,
+        where: Optional[dict] = None
+    ) -> List[List[Document]]:
+        if not hybrid:
+            return self._query_by_embeddings(vectorstore, query_embeddings, k, where)
+        
+        candidates = k * self.HYBRID_CANDIDATES_PER_RESULT
+        dense = self._query_by_embeddings(vectorstore, query_embeddings, candidates, where)
+        
+        bm25_index = self.get_bm25_index()
+        count_call("bm25_queries")
+        try:
+            # The BM25 index stores the common metadata fields and filters on them itself
+            lexical = bm25_index.search_many(questions, candidates, where=where)
+        except ValueError:
+            # Other fields: ask Chroma once for the matching IDs
+            count_call("chroma_queries")
+            allowed_ids = set(vectorstore._collection.get(where=where, include=[])["ids"])
+            lexical = bm25_index.search_many(questions, candidates, ids=allowed_ids)
+        return self._fuse_rankings(vectorstore, dense, lexical, k)
+    
+    def _fuse_rankings(
+        self,
+        vectorstore,
+        dense: List[List[Document]],
+        lexical: List[List[Tuple[str, float]]],
+        k: int
+    ) -> List[List[Document]]:
+        """
+        Merge vector and BM25 rankings with reciprocal rank fusion.
+        
+        A chunk scores sum(1 / (RRF_K + rank)) over the rankings it appears
+        in, which becomes its relevance_score; chunks only BM25 found are
+        fetched from the collection in one call.
+        """
+        fused, by_id = [], {}
+        for dense_docs, lexical_hits in zip(dense, lexical):
+            scores = {}
+            for rank, doc in enumerate(dense_docs, 1):
+                scores[doc.id] = scores.get(doc.id, 0.0) + 1 / (self.RRF_K + rank)
+                by_id[doc.id] = doc
+            for rank, (chunk_id, _) in enumerate(lexical_hits, 1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (self.RRF_K + rank)
+            fused.append(sorted(scores.items(), key=lambda item: -item[1])[:k])
+        
+        missing = list({chunk_id for top in fused for chunk_id, _ in top if chunk_id not in by_id})
+        if missing:
+            count_call("chroma_queries")
+            stored = vectorstore._collection.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, content, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                by_id[chunk_id] = Document(id=chunk_id, page_content=content, metadata=metadata or {})
+        
+        return [
+            [
+                Document(
+                    id=chunk_id,
+                    page_content=by_id[chunk_id].page_content,
+                    metadata={**by_id[chunk_id].metadata, "relevance_score": score},
+                )
+                for chunk_id, score in top
+                if chunk_id in by_id
+            ]
+            for top in fused
+        ]
+    
+    def _query_by_embeddings(
+        self,
+        vectorstore,
+        query_embeddings,
+        k: int,
+        where: Optional[dict] = None
+    ) -> List[List[Document]]:
+        """
+        Run one Chroma query for a batch of query embeddings.
+        
+        Each document's metadata gets a relevance_score (1 / (1 + distance))
+        so callers can rank results from different queries together.
+        """
+        count_call("chroma_queries")
+        results = vectorstore._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"],
+        )
+        
+        return [
+            [
+                Document(
+                    id=doc_id,
+                    page_content=content,
+                    metadata={**(metadata or {}), "relevance_score": 1 / (1 + distance)},
+                )
+                for doc_id, content, metadata, distance in zip(ids, contents, metadatas, distances)
+            ]
+            for ids, contents, metadatas, distances in zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+    
     def delete_vectorstore(self):
         """Delete the vector store."""
         import shutil
+        self._reset_vectorstore_cache()
+        with self._vectorstore_lock:
+            if self._bm25_index is not None:
+                self._bm25_index.close()
+                self._bm25_index = None
         if os.path.exists(self.chroma_path):
             shutil.rmtree(self.chroma_path)
             print(f"🗑️  Deleted vector store at {self.chroma_path}")
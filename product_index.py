@@ -0,0 +1,181 @@
+import re
+import json
+import ntpath
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Loan product names the analysis prompt (or an RM) may use for each product
+# sheet in the library, keyed by the canonical name taken from the file name
+PRODUCT_ALIASES: Dict[str, List[str]] = {
+    "Term Loan": [
+        "Business Expansion Loan",
+        "Expansion Loan",
+        "Term Financing",
+        "Equipment Financing",
+    ],
+    "Revolving Credit Facility": [
+        "Revolving Credit",
+        "RCF",
+        "Working Capital Loan",
+        "Working Capital Facility",
+        "Working Capital Financing",
+    ],
+    "Project Financing": [
+        "Project Finance",
+        "Project Loan",
+        "Property Development Loan",
+        "Infrastructure Financing",
+    ],
+    "Trade Financing": [
+        "Trade Finance",
+        "Trade Facility",
+        "Letter of Credit",
+        "Export Credit",
+        "Import Financing",
+        "Export Credit / Import Financing",
+    ],
+}
+
+# document_type metadata of the product sheets (see document_type_from_source)
+SHEET_DOCUMENT_TYPES = ("eligibility_criteria", "product_info_sheet")
+
+# File names that mark a document as a product sheet, e.g.
+# "Term_Loan_Eligibility_Criteria.pdf" -> "Term Loan"
+_SHEET_SUFFIX = re.compile(
+    r"[\s_-]+(eligibility[\s_-]+criteria|product[\s_-]+info(rmation)?[\s_-]+sheet)$",
+    re.IGNORECASE
+)
+
+
+def normalize_product_name(name: str) -> str:
+    """Lower-case a product name and drop punctuation so aliases match loosely"""
+    return " ".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+def product_name_from_source(source: str) -> Optional[str]:
+    """Canonical product name for a product sheet path, or None for other documents"""
+    # ntpath splits both / and \, so Windows-ingested sources work on any OS
+    stem = ntpath.basename(source).rsplit(".", 1)[0]
+    if not _SHEET_SUFFIX.search(stem):
+        return None
+    return re.sub(r"[\s_-]+", " ", _SHEET_SUFFIX.sub("", stem)).strip()
+
+
+def document_type_from_source(source: str) -> str:
+    """Document type of a file: eligibility_criteria, product_info_sheet or general"""
+    match = _SHEET_SUFFIX.search(ntpath.basename(source).rsplit(".", 1)[0])
+    if match is None:
+        return "general"
+    return "eligibility_criteria" if match.group(1).lower().startswith("eligibility") else "product_info_sheet"
+
+
+class ProductIndex:
+    """
+    Product sheets keyed by canonical product name.
+
+    Built once at ingestion time from the chunks of the product sheets in the
+    vector store, so suggested product names map to their criteria with a
+    dictionary lookup instead of an embedding call and a vector search.
+    Names that match no canonical name or alias are returned as unknown for
+    the caller to search for.
+    """
+
+    def __init__(self, products: Dict[str, Dict], aliases: Optional[Dict[str, List[str]]] = None):
+        """
+        products maps each canonical name to {"sources": [...], "chunks":
+        [{"id", "page_content", "metadata"}, ...]}.
+        """
+        self.products = products
+        self.aliases = PRODUCT_ALIASES if aliases is None else aliases
+
+        self._names = {}
+        for product in products:
+            self._names[normalize_product_name(product)] = product
+            for alias in self.aliases.get(product, []):
+                self._names.setdefault(normalize_product_name(alias), product)
+
+    @classmethod
+    def from_chunks(
+        cls,
+        ids: List[str],
+        contents: List[str],
+        metadatas: List[Optional[dict]],
+        aliases: Optional[Dict[str, List[str]]] = None
+    ) -> "ProductIndex":
+        """Group stored chunks by the product sheet they came from"""
+        products = {}
+
+        for chunk_id, content, metadata in zip(ids, contents, metadatas):
+            metadata = metadata or {}
+            product = product_name_from_source(metadata.get("source", ""))
+            if product is None:
+                continue
+
+            entry = products.setdefault(product, {"sources": [], "chunks": []})
+            if metadata.get("source") not in entry["sources"]:
+                entry["sources"].append(metadata.get("source"))
+            entry["chunks"].append(
+                {"id": chunk_id, "page_content": content, "metadata": metadata}
+            )
+
+        # Keep each sheet in reading order
+        for entry in products.values():
+            entry["chunks"].sort(key=lambda c: (
+                entry["sources"].index(c["metadata"].get("source")),
+                c["metadata"].get("page", 0),
+            ))
+
+        return cls(products, aliases)
+
+    @classmethod
+    def load(cls, path: str, aliases: Optional[Dict[str, List[str]]] = None) -> "ProductIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["products"], aliases)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"products": self.products}, f)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Canonical product name for a suggested name or alias"""
+        product = self._names.get(normalize_product_name(name))
+        if product is None and "/" in name:
+            # e.g. "Working Capital Loan / Revolving Credit"
+            for part in name.split("/"):
+                product = self._names.get(normalize_product_name(part))
+                if product is not None:
+                    break
+        return product
+
+    def lookup(self, name: str) -> Optional[List[Document]]:
+        """Chunks of the product sheet for a name, or None if it is unknown"""
+        product = self.resolve(name)
+        if product is None:
+            return None
+
+        # Exact matches outrank any vector search hit in the packed context
+        return [
+            Document(
+                id=chunk["id"],
+                page_content=chunk["page_content"],
+                metadata={**chunk["metadata"], "product": product, "relevance_score": 1.0},
+            )
+            for chunk in self.products[product]["chunks"]
+        ]
+
+    def lookup_many(self, names: List[str]) -> Tuple[Dict[str, List[Document]], List[str]]:
+        """
+        Look up several suggested names at once.
+
+        Returns the chunks per canonical product (each product once, in the
+        order first suggested) and the names that were not recognised.
+        """
+        found, unknown = {}, []
+        for name in names:
+            product = self.resolve(name)
+            if product is None:
+                unknown.append(name)
+            elif product not in found:
+                found[product] = self.lookup(product)
+        return found, unknown
@@ -0,0 +1,356 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable
+
+from context_packing import count_tokens
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at rate_per_minute.
+
+    Callers reserve capacity up front and are told how long to wait for it,
+    so sync and async callers (and several threads) share one bucket. The
+    balance may go negative, which queues later callers behind earlier ones.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount from the bucket and return the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # Requests larger than the bucket would otherwise never fit
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """
+    Client-side limits for one provider: requests and tokens per minute.
+
+    Either limit may be None (unlimited).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def _reserve(self, tokens: int, requests: int) -> float:
+        wait = 0.0
+        if self.requests is not None and requests:
+            wait = max(wait, self.requests.reserve(requests))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0, requests: int = 1):
+        """Block until a request of about this many tokens is within the limits"""
+        wait = self._reserve(tokens, requests)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0, requests: int = 1):
+        wait = self._reserve(tokens, requests)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def charge(self, tokens: int):
+        """Account for tokens only known after the call (e.g. completion tokens)"""
+        if self.tokens is not None and tokens:
+            self.tokens.reserve(tokens)
+
+
+# One limiter per provider, shared by every module in the process
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Shared limiter for a provider such as "tavily", "gemini" or "gemini_embeddings"
+
+    Limits come from RATE_LIMIT_<PROVIDER>_RPM and RATE_LIMIT_<PROVIDER>_TPM
+    (e.g. RATE_LIMIT_GEMINI_RPM=15); unset means unlimited.
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            prefix = f"RATE_LIMIT_{provider.upper()}"
+            rpm, tpm = os.getenv(f"{prefix}_RPM"), os.getenv(f"{prefix}_TPM")
+            _limiters[provider] = RateLimiter(
+                requests_per_minute=float(rpm) if rpm else None,
+                tokens_per_minute=float(tpm) if tpm else None
+            )
+        return _limiters[provider]
+
+
+def set_rate_limiter(provider: str, limiter: RateLimiter):
+    """Replace a provider's shared limiter (e.g. with limits from a config file)"""
+    with _limiters_lock:
+        _limiters[provider] = limiter
+
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_MARKERS = (
+    "429", "rate limit", "ratelimit", "quota", "resource exhausted", "resourceexhausted",
+    "too many requests", "temporarily unavailable", "service unavailable", "timed out", "timeout",
+)
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for quota, throttling, timeout and 5xx errors"""
+    response = getattr(error, "response", None)
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(response, "status_code", None),
+    ):
+        if isinstance(status, int) and status in _RETRYABLE_STATUS:
+            return True
+
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _RETRYABLE_MARKERS)
+
+
+class ToolErrorResult(RuntimeError):
+    """A tool returned its error message instead of raising it"""
+
+
+def raise_error_result(result):
+    """
+    Raise ToolErrorResult for a string result, otherwise return it unchanged
+
+    TavilySearchResults catches API errors (429 included) and returns
+    repr(error) in place of the result list; as an exception it is seen by
+    is_retryable and retried like any other quota error.
+    """
+    if isinstance(result, str):
+        raise ToolErrorResult(result)
+    return result
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter for retry number attempt (0-based)"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def _input_tokens(payload) -> int:
+    """Estimate the prompt tokens of a runnable input"""
+    if hasattr(payload, "to_string"):
+        return count_tokens(payload.to_string())
+    if isinstance(payload, list):
+        return sum(count_tokens(str(getattr(m, "content", m))) for m in payload)
+    if isinstance(payload, dict):
+        return count_tokens(" ".join(str(v) for v in payload.values()))
+    return count_tokens(str(payload))
+
+
+def _output_tokens(result) -> int:
+    usage = getattr(result, "usage_metadata", None) or {}
+    return usage.get("output_tokens", 0)
+
+
+class RateLimitedRunnable(Runnable):
+    """
+    Runnable wrapper that applies a RateLimiter and retries transient errors.
+
+    Each call first waits for the limiter (one request plus the estimated
+    prompt tokens), and completion tokens reported in usage_metadata are
+    charged afterwards. Quota, throttling, timeout and 5xx errors (see
+    is_retryable) are retried with jittered exponential backoff; a stream is
+    only retried if it failed before yielding anything. check_result, if
+    given, is applied to each invoke result and may raise to mark it failed
+    (see raise_error_result). Other attributes (e.g. max_results) are read
+    from the wrapped runnable.
+    """
+
+    def __init__(
+        self,
+        runnable: Runnable,
+        limiter: RateLimiter,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        estimate_tokens: Callable = _input_tokens,
+        check_result: Optional[Callable] = None
+    ):
+        self.runnable = runnable
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.estimate_tokens = estimate_tokens
+        self.check_result = check_result
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the wrapper itself
+        if name == "runnable":
+            raise AttributeError(name)
+        return getattr(self.runnable, name)
+
+    @property
+    def InputType(self):
+        return self.runnable.InputType
+
+    @property
+    def OutputType(self):
+        return self.runnable.OutputType
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        return attempt < self.max_retries and is_retryable(error)
+
+    def _delay(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.base_delay, self.max_delay)
+
+    def _checked(self, result):
+        return self.check_result(result) if self.check_result else result
+
+    def invoke(self, input, config=None, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(self.estimate_tokens(input))
+            try:
+                result = self._checked(self.runnable.invoke(input, config, **kwargs))
+                self.limiter.charge(_output_tokens(result))
+                return result
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self._delay(attempt))
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire(self.estimate_tokens(input))
+            try:
+                result = self._checked(await self.runnable.ainvoke(input, config, **kwargs))
+                self.limiter.charge(_output_tokens(result))
+                return result
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+
+    def stream(self, input, config=None, **kwargs) -> Iterator:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(self.estimate_tokens(input))
+            started = False
+            try:
+                for chunk in self.runnable.stream(input, config, **kwargs):
+                    started = True
+                    self.limiter.charge(_output_tokens(chunk))
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self._delay(attempt))
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire(self.estimate_tokens(input))
+            started = False
+            try:
+                async for chunk in self.runnable.astream(input, config, **kwargs):
+                    started = True
+                    self.limiter.charge(_output_tokens(chunk))
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+
+
+def rate_limited(runnable: Runnable, provider: str, **retry_options) -> RateLimitedRunnable:
+    """Wrap a runnable with the shared limiter for provider"""
+    return RateLimitedRunnable(runnable, get_rate_limiter(provider), **retry_options)
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with the same limiting and retries as RateLimitedRunnable.
+
+    Each embed call counts as one request plus the tokens of its texts.
+    """
+
+    def __init__(
+        self,
+        embed_model: Embeddings,
+        limiter: RateLimiter,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        self.embed_model = embed_model
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def __getattr__(self, name):
+        # e.g. .model, which CachedEmbeddings uses in its cache keys
+        if name == "embed_model":
+            raise AttributeError(name)
+        return getattr(self.embed_model, name)
+
+    def _call(self, fn, texts_tokens: int):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(texts_tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+
+    async def _acall(self, fn, texts_tokens: int):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire(texts_tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+
+    # Keyword arguments (e.g. task_type) are passed on to the wrapped model
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        if not texts:
+            return []
+        tokens = sum(count_tokens(text) for text in texts)
+        return self._call(lambda: self.embed_model.embed_documents(texts, **kwargs), tokens)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(lambda: self.embed_model.embed_query(text), count_tokens(text))
+
+    async def aembed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        if not texts:
+            return []
+        tokens = sum(count_tokens(text) for text in texts)
+        return await self._acall(lambda: self.embed_model.aembed_documents(texts, **kwargs), tokens)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._acall(lambda: self.embed_model.aembed_query(text), count_tokens(text))
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Optional
+
+from call_counts import count_call
+
+
+class CachedSearch:
+    """
+    TTL cache in front of a search tool such as TavilySearchResults.
+
+    Results are stored in SQLite keyed by the normalized query plus the
+    tool's max_results, so repeated searches for the same company skip the
+    API. With offline=True every lookup is served from the
+    cache (expired entries included) and a miss raises LookupError, which
+    lets past runs be replayed without network access.
+
+    Hits and API calls are also reported to call_counts.collect_calls().
+    """
+
+    def __init__(
+        self,
+        search,
+        cache_path: str = "./search_cache.sqlite3",
+        ttl_seconds: Optional[float] = 24 * 60 * 60,
+        offline: bool = False
+    ):
+        self.search = search
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_results "
+            "(key TEXT PRIMARY KEY, query TEXT, results TEXT, created_at REAL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _query_text(search_input) -> str:
+        if isinstance(search_input, dict):
+            return search_input["query"]
+        return str(search_input)
+
+    def _key(self, query: str) -> str:
+        normalized = " ".join(query.lower().split())
+        key_parts = {
+            "query": normalized,
+            "max_results": getattr(self.search, "max_results", None),
+        }
+        return hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, created_at FROM search_results WHERE key = ?", (key,)
+            ).fetchone()
+
+            fresh = row is not None and (
+                self.offline
+                or self.ttl_seconds is None
+                or time.time() - row[1] <= self.ttl_seconds
+            )
+
+            if fresh:
+                self.hits += 1
+                count_call("search_cache_hits")
+                return json.loads(row[0])
+
+            self.misses += 1
+            if self.offline:
+                raise LookupError("Search result not cached (offline mode)")
+            return None
+
+    def _put(self, key: str, query: str, results):
+        # Error strings from the tool are not cached, only real result lists
+        if not isinstance(results, list):
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results (key, query, results, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, query, json.dumps(results), time.time()),
+            )
+            self._conn.commit()
+
+    def invoke(self, search_input, config=None, **kwargs):
+        query = self._query_text(search_input)
+        key = self._key(query)
+
+        results = self._get(key)
+        if results is None:
+            count_call("search_calls")
+            results = self.search.invoke(search_input, config, **kwargs)
+            self._put(key, query, results)
+
+        return results
+
+    async def ainvoke(self, search_input, config=None, **kwargs):
+        query = self._query_text(search_input)
+        key = self._key(query)
+
+        results = await asyncio.to_thread(self._get, key)
+        if results is None:
+            count_call("search_calls")
+            results = await self.search.ainvoke(search_input, config, **kwargs)
+            await asyncio.to_thread(self._put, key, query, results)
+
+        return results
+
+    def cache_stats(self) -> dict:
+        """Return hit/miss counters for this process."""
+        return {"hits": self.hits, "misses": self.misses}
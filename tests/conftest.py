@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multi_doc_rag import MultiDocumentRAG  # noqa: E402
+
+
+class RecordingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embedding model that records each call and the task type it asked for"""
+
+    calls: list = []
+
+    def embed_documents(self, texts, task_type=None):
+        self.calls.append(("embed_documents", task_type, list(texts)))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text, task_type=None):
+        self.calls.append(("embed_query", task_type, [text]))
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts, task_type=None):
+        return self.embed_documents(texts, task_type=task_type)
+
+    async def aembed_query(self, text, task_type=None):
+        return self.embed_query(text, task_type=task_type)
+
+
+@pytest.fixture
+def embed_model():
+    return RecordingEmbeddings(size=32, calls=[])
+
+
+@pytest.fixture
+def make_rag(tmp_path, embed_model):
+    """Build MultiDocumentRAG instances over one store in tmp_path"""
+
+    def make(**kwargs):
+        kwargs.setdefault("embed_model", embed_model)
+        kwargs.setdefault("chroma_path", str(tmp_path / "db"))
+        kwargs.setdefault("embedding_cache_path", str(tmp_path / "embedding_cache.sqlite3"))
+        return MultiDocumentRAG(**kwargs)
+
+    return make
+
+
+@pytest.fixture
+def write_docs(tmp_path):
+    """Write {relative path: text} files under tmp_path/docs and return the directory"""
+    docs = tmp_path / "docs"
+
+    def write(files):
+        for name, text in files.items():
+            path = docs / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding="utf-8")
+        return docs
+
+    return write
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.runnables import RunnableLambda
+
+from langgraph_rm_proposal_v2 import (
+    _parse_batch_loan_products,
+    aidentify_loan_products_batch,
+    build_initial_state,
+    identify_loan_products_batch,
+)
+
+
+class BatchLLM:
+    """Answers batched classification prompts and tracks requests in flight"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        companies = re.findall(r"### Company (\d+):", prompt.to_string())
+        return json.dumps({number: ["Term Loan", "Trade Finance"] for number in companies})
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def invoke(self, prompt):
+        self._enter()
+        time.sleep(self.latency)
+        self._exit()
+        return self._answer(prompt)
+
+    async def ainvoke(self, prompt):
+        self._enter()
+        await asyncio.sleep(self.latency)
+        self._exit()
+        return self._answer(prompt)
+
+    def runnable(self):
+        return RunnableLambda(self.invoke, afunc=self.ainvoke)
+
+
+def _states(count):
+    return [
+        {**build_initial_state(f"Company {i}", "query"), "web_results": []}
+        for i in range(count)
+    ]
+
+
+def test_batch_parser_keeps_valid_entries():
+    response = """```json
+    {"1": ["Term Loan", "trade finance"], "2": ["Not A Product", "Term Loan"], "3": ["Term Loan"],
+     "4": {"products": ["Bridge Loan", "SME Loan"]}, "9": ["Term Loan", "SME Loan"]}
+    ```"""
+
+    assert _parse_batch_loan_products(response, 4) == {
+        0: ["Term Loan", "Trade Finance"],
+        3: ["Bridge Loan", "SME Loan"],
+    }
+    assert _parse_batch_loan_products("not json", 4) == {}
+
+
+def test_sync_batches_run_on_the_executor():
+    llm = BatchLLM()
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        states = identify_loan_products_batch(_states(6), 1, llm.runnable(), executor=executor)
+
+    assert llm.max_in_flight == 3
+    assert [state["company_name"] for state in states] == [f"Company {i}" for i in range(6)]
+    assert all(state["suggested_loan_products"] == ["Term Loan", "Trade Finance"] for state in states)
+
+
+def test_async_batches_respect_the_semaphore():
+    llm = BatchLLM()
+
+    async def classify(semaphore=None):
+        return await aidentify_loan_products_batch(_states(6), 1, llm.runnable(), semaphore)
+
+    asyncio.run(classify(asyncio.Semaphore(2)))
+    assert llm.max_in_flight == 2
+
+    llm.max_in_flight = 0
+    states = asyncio.run(classify())
+    assert llm.max_in_flight == 1
+    assert all(state["suggested_loan_products"] == ["Term Loan", "Trade Finance"] for state in states)
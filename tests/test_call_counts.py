@@ -0,0 +1,71 @@
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+import langgraph_rm_proposal_v2 as v2
+from call_counts import collect_calls
+from clients import set_client
+from search_cache import CachedSearch
+
+
+def _search_results(search_input):
+    return [{"title": "News", "url": "https://example.com", "content": "Expansion plans", "score": 0.9}]
+
+
+def test_cached_search_counts_api_calls_and_hits(tmp_path):
+    search = CachedSearch(RunnableLambda(_search_results), cache_path=str(tmp_path / "search.sqlite3"))
+
+    with collect_calls() as counts:
+        search.invoke({"query": "Acme Berhad"})
+        search.invoke({"query": "acme  berhad"})
+        asyncio.run(search.ainvoke({"query": "Acme Berhad"}))
+
+    assert counts == {"search_calls": 1, "search_cache_hits": 2}
+
+
+def test_web_search_node_reports_measured_calls(tmp_path):
+    web_search = v2.instrument_node("web_search", v2.web_search_node)
+    state = v2.build_initial_state("Acme", "Acme Berhad news")
+
+    try:
+        set_client("search", CachedSearch(RunnableLambda(_search_results), cache_path=str(tmp_path / "s.sqlite3")))
+        first = web_search(state)["metrics"]["web_search"]
+        second = web_search(state)["metrics"]["web_search"]
+
+        # A client without the cache reaches the API every time
+        set_client("search", RunnableLambda(_search_results))
+        uncached = web_search(state)["metrics"]["web_search"]
+    finally:
+        set_client("search", None)
+
+    assert first["search_calls"] == 1 and "search_cache_hits" not in first
+    assert second["search_cache_hits"] == 1 and "search_calls" not in second
+    assert uncached["search_calls"] == 1
+
+
+def test_retrieval_node_counts_embedding_and_store_calls(make_rag):
+    rag = make_rag()
+    rag.create_vectorstore(documents=[
+        Document(page_content="Bridge Loan: repaid from the sale of assets", metadata={"source": "bridge.txt"}),
+        Document(page_content="Letter of Credit: issued for imports", metadata={"source": "lc.txt"}),
+    ])
+    retrieve = v2.instrument_node("retrieve_product_info", v2.retrieve_product_info_node)
+    aretrieve = v2.instrument_node("retrieve_product_info", v2.aretrieve_product_info_node)
+    state = {**v2.build_initial_state("Acme", "query"), "suggested_loan_products": ["Bridge Loan", "Letter of Credit"]}
+
+    try:
+        set_client("rag_system", rag)
+        first = retrieve(state)["metrics"]["retrieve_product_info"]
+        second = asyncio.run(aretrieve(state))["metrics"]["retrieve_product_info"]
+    finally:
+        set_client("rag_system", None)
+
+    # The sheet filter matches nothing here, so each run searches twice (one
+    # Chroma query and one BM25 query each); only the first search embeds
+    assert first["embedding_calls"] == 1
+    assert first["embedding_cache_hits"] == 2
+    assert first["chroma_queries"] == 2
+    assert first["bm25_queries"] == 2
+    assert "embedding_calls" not in second
+    assert second["embedding_cache_hits"] == 4
@@ -0,0 +1,40 @@
+import importlib
+import sys
+import types
+
+import context_packing
+
+
+def _reload_with_tiktoken(monkeypatch, get_encoding):
+    calls = []
+
+    def load(name):
+        calls.append(name)
+        return get_encoding(name)
+
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(get_encoding=load))
+    return importlib.reload(context_packing), calls
+
+
+def test_encoding_is_not_loaded_on_import(monkeypatch):
+    module, calls = _reload_with_tiktoken(monkeypatch, lambda name: None)
+    try:
+        assert calls == []
+    finally:
+        monkeypatch.delitem(sys.modules, "tiktoken")
+        importlib.reload(module)
+
+
+def test_offline_tiktoken_falls_back_to_estimate(monkeypatch):
+    def offline(name):
+        raise ConnectionError("cannot download cl100k_base")
+
+    module, calls = _reload_with_tiktoken(monkeypatch, offline)
+    try:
+        assert module.count_tokens("x" * 40) == 10
+        assert module.count_tokens("y" * 8) == 2
+        # The failed load is not retried on every call
+        assert calls == ["cl100k_base"]
+    finally:
+        monkeypatch.delitem(sys.modules, "tiktoken")
+        importlib.reload(module)
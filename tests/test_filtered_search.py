@@ -0,0 +1,78 @@
+import os
+
+from bm25_index import BM25Index, where_sql
+
+TERM_LOAN = "Term_Loan_Eligibility_Criteria.txt"
+TRADE = "Trade_Financing_Eligibility_Criteria.txt"
+NOTE = "credit_note.txt"
+
+
+def _ingest(make_rag, write_docs):
+    docs = write_docs({
+        TERM_LOAN: "Product: Term Loan\nEffective date: 1 March 2025\nDSCR of at least 1.25x.",
+        TRADE: "Product: Trade Financing\nDSCR is not assessed for letters of credit.",
+        NOTE: "Product: SME Green Financing\nDSCR of at least 1.5x for green projects.",
+    })
+    rag = make_rag()
+    rag.create_vectorstore(directory_path=str(docs))
+    return rag
+
+
+def _names(docs):
+    return [os.path.basename(doc.metadata["source"]) for doc in docs]
+
+
+def test_ingested_chunks_carry_product_metadata(make_rag, write_docs):
+    rag = _ingest(make_rag, write_docs)
+    stored = rag.load_vectorstore()._collection.get(include=["metadatas"])["metadatas"]
+    by_name = {os.path.basename(m["source"]): m for m in stored}
+
+    assert by_name[TERM_LOAN]["document_type"] == "eligibility_criteria"
+    assert by_name[TERM_LOAN]["product_family"] == "Term Loan"
+    assert by_name[TERM_LOAN]["effective_date"] == "2025-03-01"
+    assert by_name[NOTE]["document_type"] == "general"
+    assert by_name[NOTE]["product_family"] == "SME Green Financing"
+    # No effective date line and no PDF metadata: no date, not the file's mtime
+    assert "effective_date" not in by_name[TRADE]
+
+
+def test_filtered_hybrid_search_stays_inside_the_filter(make_rag, write_docs, monkeypatch):
+    rag = _ingest(make_rag, write_docs)
+    collection = rag.load_vectorstore()._collection
+    filtered_gets = []
+    get = type(collection).get
+    monkeypatch.setattr(
+        type(collection), "get",
+        lambda self, *args, **kwargs: (filtered_gets.append(kwargs.get("where")), get(self, *args, **kwargs))[1]
+    )
+
+    results = rag.query_many(["DSCR"], k=3, where={"product_family": "Term Loan"})[0]
+    sheets = rag.query_many(
+        ["DSCR"], k=3, where={"document_type": {"$in": ["eligibility_criteria", "product_info_sheet"]}}
+    )[0]
+
+    assert _names(results) == [TERM_LOAN]
+    assert sorted(_names(sheets)) == [TERM_LOAN, TRADE]
+    # The BM25 side applied the filter itself instead of listing matching IDs
+    assert [where for where in filtered_gets if where] == []
+
+
+def test_bm25_where_filters(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    index.add(
+        ["a", "b", "c"],
+        ["DSCR 1.25x", "DSCR 1.5x", "DSCR waived"],
+        [
+            {"product_family": "Term Loan", "effective_date": "2024-01-01"},
+            {"product_family": "Term Loan", "effective_date": "2025-06-01"},
+            {"product_family": "Trade Financing"},
+        ],
+    )
+
+    def ids(where):
+        return sorted(chunk_id for chunk_id, _ in index.search("dscr", k=10, where=where))
+
+    assert ids({"product_family": "Term Loan"}) == ["a", "b"]
+    assert ids({"$and": [{"product_family": "Term Loan"}, {"effective_date": {"$gte": "2025-01-01"}}]}) == ["b"]
+    assert ids({"$or": [{"product_family": {"$nin": ["Term Loan"]}}, {"effective_date": {"$lt": "2025-01-01"}}]}) == ["a", "c"]
+    assert where_sql({"product_family": {"$in": []}})[0] == "0"
@@ -0,0 +1,73 @@
+import pytest
+from langchain_core.documents import Document
+
+from bm25_index import BM25Index
+
+FILLER = [f"General corporate banking note number {i} about account opening." for i in range(30)]
+DSCR = "Revolving Credit Facility requires a DSCR of at least 1.25x."
+
+
+@pytest.fixture
+def rag(make_rag):
+    rag = make_rag()
+    rag.create_vectorstore(documents=[
+        Document(page_content=text, metadata={"source": f"note_{i}.txt"})
+        for i, text in enumerate(FILLER + [DSCR])
+    ])
+    return rag
+
+
+def _chunk_id(rag, text):
+    stored = rag.load_vectorstore()._collection.get(include=["documents"])
+    return stored["ids"][stored["documents"].index(text)]
+
+
+def test_bm25_index_tracks_the_collection(rag):
+    assert sorted(rag.get_bm25_index().ids()) == sorted(rag.load_vectorstore()._collection.get()["ids"])
+
+
+def test_bm25_ranks_exact_terms_first(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    index.add(["filler", "dscr", "both"], [
+        "Minimum annual turnover of RM 5 million.",
+        "DSCR of at least 1.25x.",
+        "DSCR and DSCR covenants tested yearly, plus turnover and collateral and other terms.",
+    ])
+
+    ranked = [chunk_id for chunk_id, _ in index.search("DSCR covenant", k=3)]
+
+    assert ranked[0] == "both"
+    assert "filler" not in ranked
+
+
+def test_reciprocal_rank_fusion(rag):
+    dscr_id = _chunk_id(rag, DSCR)
+    a, b = (Document(id=f"dense-{i}", page_content=f"dense {i}", metadata={}) for i in range(2))
+
+    fused = rag._fuse_rankings(
+        rag.load_vectorstore(),
+        dense=[[a, b]],
+        lexical=[[("dense-1", 3.0), (dscr_id, 2.0)]],
+        k=3,
+    )[0]
+
+    rrf = rag.RRF_K
+    # dense-1 is ranked by both searches, so it beats dense-0, which only the vector search found
+    assert [doc.id for doc in fused] == ["dense-1", "dense-0", dscr_id]
+    assert fused[0].metadata["relevance_score"] == pytest.approx(1 / (rrf + 2) + 1 / (rrf + 1))
+    assert fused[1].metadata["relevance_score"] == pytest.approx(1 / (rrf + 1))
+    # Chunks only BM25 found are fetched from the collection
+    assert fused[2].page_content == DSCR and fused[2].metadata["source"] == "note_30.txt"
+
+
+def test_hybrid_query_finds_exact_term_at_small_k(rag):
+    results = rag.query_many(["DSCR"], k=2)[0]
+
+    assert DSCR in [doc.page_content for doc in results]
+    assert all(0 < doc.metadata["relevance_score"] <= 2 / (rag.RRF_K + 1) for doc in results)
+
+
+def test_vector_only_search_skips_bm25(rag, monkeypatch):
+    monkeypatch.setattr(BM25Index, "search_many", lambda *args, **kwargs: pytest.fail("BM25 used"))
+
+    assert len(rag.query_many(["DSCR"], k=2, hybrid=False)[0]) == 2
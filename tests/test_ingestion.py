@@ -0,0 +1,127 @@
+import json
+import shutil
+
+from langchain_core.documents import Document
+
+TERM_LOAN = "Term_Loan_Eligibility_Criteria.txt"
+TRADE = "Trade_Financing_Eligibility_Criteria.txt"
+
+
+def _stored(rag):
+    stored = rag.load_vectorstore()._collection.get(include=["metadatas"])
+    return dict(zip(stored["ids"], stored["metadatas"]))
+
+
+def _manifest(rag):
+    with open(rag.manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_reingesting_unchanged_files_embeds_nothing(make_rag, write_docs, embed_model):
+    docs = write_docs({TERM_LOAN: "Product: Term Loan\nDSCR at least 1.25x.", TRADE: "Letters of credit."})
+    rag = make_rag(cache_embeddings=False)
+    rag.create_vectorstore(directory_path=str(docs))
+    embed_model.calls.clear()
+
+    rag.create_vectorstore(directory_path=str(docs))
+
+    assert embed_model.calls == []
+    assert len(_stored(rag)) == 2
+
+
+def test_changed_and_removed_files_replace_their_chunks(make_rag, write_docs):
+    docs = write_docs({TERM_LOAN: "DSCR at least 1.25x.", TRADE: "Letters of credit."})
+    rag = make_rag()
+    rag.create_vectorstore(directory_path=str(docs))
+    old_ids = set(_stored(rag))
+
+    write_docs({TERM_LOAN: "DSCR at least 1.5x."})
+    (docs / TRADE).unlink()
+    rag.create_vectorstore(directory_path=str(docs))
+
+    stored = _stored(rag)
+    assert len(stored) == 1
+    assert not old_ids & set(stored)
+    [entry] = _manifest(rag)["files"].values()
+    assert entry["chunk_ids"] == list(stored)
+    assert rag.get_bm25_index().ids() == list(stored)
+
+
+def test_legacy_chunks_with_foreign_paths_are_replaced(make_rag, write_docs):
+    docs = write_docs({TERM_LOAN: "DSCR at least 1.25x.", TRADE: "Letters of credit."})
+
+    # A store built before the manifest: random IDs and sources from another machine
+    rag = make_rag()
+    rag._open_or_create_vectorstore().add_documents([
+        Document(page_content="DSCR at least 1.25x.",
+                 metadata={"source": "C:\\Users\\rm\\my_documents\\" + TERM_LOAN}),
+        Document(page_content="Letters of credit.",
+                 metadata={"source": "C:\\Users\\rm\\my_documents\\" + TRADE}),
+        Document(page_content="Notes kept elsewhere.",
+                 metadata={"source": "C:\\Users\\rm\\archive\\notes.txt"}),
+    ])
+
+    make_rag().create_vectorstore(document_paths=[str(docs / TERM_LOAN)])
+    rag = make_rag()
+    sources = sorted(m["source"].replace("\\", "/").rsplit("/", 1)[-1] for m in _stored(rag).values())
+    assert sources == [TERM_LOAN, TRADE, "notes.txt"]
+    # Trade Financing and the notes still have legacy chunks to clean up later
+    assert _manifest(rag).get("legacy_cleanup")
+
+    rag.create_vectorstore(directory_path=str(docs))
+
+    stored = _stored(make_rag())
+    names = sorted(m["source"].replace("\\", "/").rsplit("/", 1)[-1] for m in stored.values())
+    assert names == [TERM_LOAN, TRADE, "notes.txt"]
+    assert sorted(make_rag().get_product_index().products) == ["Term Loan", "Trade Financing"]
+    assert all(len(entry["chunks"]) == 1 for entry in make_rag().get_product_index().products.values())
+
+
+
+def _ingest_project(project, make_rag, monkeypatch):
+    """Ingest ./docs into project/db from inside project"""
+    # Chroma caches clients by path, so the store path must differ per location
+    monkeypatch.chdir(project)
+    rag = make_rag(chroma_path=str(project / "db"))
+    rag.create_vectorstore(directory_path="./docs")
+    return rag
+
+
+def test_moved_project_keeps_its_chunks(tmp_path, make_rag, monkeypatch, embed_model):
+    (tmp_path / "a" / "docs").mkdir(parents=True)
+    (tmp_path / "a" / "docs" / TERM_LOAN).write_text("DSCR at least 1.25x.", encoding="utf-8")
+    ids = set(_stored(_ingest_project(tmp_path / "a", make_rag, monkeypatch)))
+
+    shutil.move(tmp_path / "a", tmp_path / "b")
+    embed_model.calls.clear()
+    rag = _ingest_project(tmp_path / "b", make_rag, monkeypatch)
+
+    assert set(_stored(rag)) == ids
+    assert embed_model.calls == []
+    assert list(_manifest(rag)["files"]) == ["docs/" + TERM_LOAN]
+    assert len(rag.get_product_index().products["Term Loan"]["chunks"]) == 1
+
+
+def test_moved_project_with_absolute_manifest_keys(tmp_path, make_rag, monkeypatch):
+    (tmp_path / "a" / "docs").mkdir(parents=True)
+    (tmp_path / "a" / "docs" / TERM_LOAN).write_text("DSCR at least 1.25x.", encoding="utf-8")
+    (tmp_path / "a" / "docs" / TRADE).write_text("Letters of credit.", encoding="utf-8")
+    rag = _ingest_project(tmp_path / "a", make_rag, monkeypatch)
+
+    # Manifest as written when keys were absolute paths
+    manifest = _manifest(rag)
+    manifest["files"] = {
+        str((tmp_path / "a" / key).resolve()): entry for key, entry in manifest["files"].items()
+    }
+    rag._save_manifest(manifest)
+
+    shutil.move(tmp_path / "a", tmp_path / "b")
+    rag = _ingest_project(tmp_path / "b", make_rag, monkeypatch)
+
+    # Old entries are matched to the moved files by content hash
+    stored = _stored(rag)
+    manifest = _manifest(rag)
+    assert len(stored) == 2
+    assert sorted(manifest["files"]) == ["docs/" + TERM_LOAN, "docs/" + TRADE]
+    assert sorted(i for entry in manifest["files"].values() for i in entry["chunk_ids"]) == sorted(stored)
+    assert sorted(rag.get_product_index().products) == ["Term Loan", "Trade Financing"]
@@ -0,0 +1,55 @@
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from multi_doc_rag import QUERY_TASK_TYPE, embed_queries
+
+
+def _ingest(rag):
+    rag.create_vectorstore(documents=[
+        Document(page_content="Term Loan: DSCR of at least 1.25x", metadata={"source": "term.txt"}),
+        Document(page_content="Trade Financing: letters of credit", metadata={"source": "trade.txt"}),
+    ])
+
+
+def test_query_many_embeds_questions_as_queries(make_rag, embed_model):
+    rag = make_rag()
+    _ingest(rag)
+    embed_model.calls.clear()
+
+    rag.query_many(["DSCR requirement", "letter of credit"], k=1)
+
+    assert embed_model.calls == [
+        ("embed_documents", QUERY_TASK_TYPE, ["DSCR requirement", "letter of credit"])
+    ]
+
+
+def test_query_vectors_are_cached_as_queries(make_rag, embed_model):
+    rag = make_rag()
+    _ingest(rag)
+    embed_model.calls.clear()
+
+    rag.query_many(["DSCR requirement"], k=1)
+    # Same cache entry as embed_query(), so neither call reaches the model again
+    rag.embed_model.embed_query("DSCR requirement")
+    asyncio.run(rag.aquery_many(["DSCR requirement"], k=1))
+
+    assert len(embed_model.calls) == 1
+    assert rag.embed_model.embed_query("DSCR requirement") == \
+        embed_model.embed_query("DSCR requirement", task_type=QUERY_TASK_TYPE)
+
+
+def test_models_without_task_type_use_embed_query():
+    class QueryOnly(DeterministicFakeEmbedding):
+        queries: list = []
+
+        def embed_query(self, text):
+            self.queries.append(text)
+            return super().embed_query(text)
+
+    model = QueryOnly(size=8, queries=[])
+    vectors = embed_queries(model, ["a", "b"])
+
+    assert model.queries == ["a", "b"]
+    assert len(vectors) == 2
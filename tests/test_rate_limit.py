@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+
+from rate_limit import (
+    RateLimitedRunnable,
+    RateLimiter,
+    ToolErrorResult,
+    is_retryable,
+    raise_error_result,
+)
+
+RESULT = {"title": "News", "url": "https://example.com", "content": "Expansion plans", "score": 0.9}
+
+
+class FlakyTavilyAPI(TavilySearchAPIWrapper):
+    """Tavily API wrapper that fails with the given errors before answering"""
+
+    errors: list = []
+    calls: int = 0
+
+    def raw_results(self, query, *args, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"results": [RESULT]}
+
+    async def raw_results_async(self, query, *args, **kwargs):
+        return self.raw_results(query)
+
+
+def _search(*errors):
+    api = FlakyTavilyAPI(tavily_api_key="test", errors=list(errors))
+    search = RateLimitedRunnable(
+        TavilySearchResults(max_results=5, api_wrapper=api),
+        RateLimiter(),
+        max_retries=2,
+        base_delay=0,
+        check_result=raise_error_result
+    )
+    return search, api
+
+
+def test_tavily_error_strings_are_retried():
+    search, api = _search(Exception("429 Too Many Requests: rate limit exceeded"))
+
+    results = search.invoke({"query": "Acme Berhad"})
+
+    assert api.calls == 2
+    assert [r["url"] for r in results] == [RESULT["url"]]
+
+
+def test_tavily_error_strings_are_retried_async():
+    search, api = _search(Exception("503 Service Unavailable"))
+
+    results = asyncio.run(search.ainvoke({"query": "Acme Berhad"}))
+
+    assert api.calls == 2
+    assert [r["url"] for r in results] == [RESULT["url"]]
+
+
+def test_other_tavily_errors_raise_without_retry():
+    search, api = _search(Exception("401 Unauthorized: invalid API key"))
+
+    with pytest.raises(ToolErrorResult, match="401"):
+        search.invoke({"query": "Acme Berhad"})
+    assert api.calls == 1
+
+
+def test_retries_stop_after_max_retries():
+    search, api = _search(*[Exception("429 Too Many Requests")] * 5)
+
+    with pytest.raises(ToolErrorResult, match="429"):
+        search.invoke({"query": "Acme Berhad"})
+    assert api.calls == 3
+
+
+def test_is_retryable():
+    assert is_retryable(TimeoutError())
+    assert is_retryable(Exception("Resource exhausted: quota"))
+    assert not is_retryable(ValueError("bad request"))
@@ -0,0 +1,38 @@
+from langchain_core.runnables import RunnableLambda
+
+from search_cache import CachedSearch
+
+
+class FakeSearch:
+    """Search tool stand-in with the max_results field the cache keys on"""
+
+    def __init__(self, max_results):
+        self.max_results = max_results
+        self.calls = 0
+
+    def invoke(self, search_input, config=None, **kwargs):
+        self.calls += 1
+        return [{"title": "News", "url": "https://example.com", "content": "Expansion", "score": 0.9}]
+
+
+def test_cache_key_ignores_case_and_spacing_but_not_max_results(tmp_path):
+    path = str(tmp_path / "search.sqlite3")
+    search = FakeSearch(max_results=30)
+    cached = CachedSearch(search, cache_path=path)
+
+    cached.invoke({"query": "Acme Berhad news"})
+    cached.invoke({"query": "  acme BERHAD   news"})
+    assert search.calls == 1
+
+    fewer = FakeSearch(max_results=5)
+    CachedSearch(fewer, cache_path=path).invoke({"query": "Acme Berhad news"})
+    assert fewer.calls == 1
+
+
+def test_error_strings_are_not_cached(tmp_path):
+    cached = CachedSearch(RunnableLambda(lambda q: "Exception('429')"), cache_path=str(tmp_path / "s.sqlite3"))
+
+    cached.invoke({"query": "Acme"})
+    cached.invoke({"query": "Acme"})
+
+    assert cached.cache_stats() == {"hits": 0, "misses": 2}
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from multi_doc_rag import MultiDocumentRAG
+
+from conftest import RecordingEmbeddings
+
+
+class FailingEmbeddings(RecordingEmbeddings):
+    """Fake model that fails once it has embedded fail_after batches"""
+
+    fail_after: int = 0
+
+    def embed_documents(self, texts, task_type=None):
+        if len([c for c in self.calls if c[0] == "embed_documents"]) >= self.fail_after:
+            raise RuntimeError("embedding API went away")
+        return super().embed_documents(texts, task_type=task_type)
+
+
+def _files(count):
+    return {f"policy_{i}.txt": f"Policy {i}: minimum paid-up capital RM {i} million." for i in range(count)}
+
+
+def test_interrupted_ingest_resumes_without_re_embedding(make_rag, write_docs, tmp_path):
+    docs = write_docs(_files(4))
+    failing = FailingEmbeddings(size=32, calls=[], fail_after=2)
+
+    with pytest.raises(RuntimeError):
+        make_rag(embed_model=failing, cache_embeddings=False).create_vectorstore(
+            directory_path=str(docs), batch_size=1
+        )
+    embedded_before = [text for _, _, texts in failing.calls for text in texts]
+    assert len(embedded_before) == 2
+
+    model = RecordingEmbeddings(size=32, calls=[])
+    rag = make_rag(embed_model=model, cache_embeddings=False)
+    rag.create_vectorstore(directory_path=str(docs), batch_size=1)
+
+    embedded_after = [text for _, _, texts in model.calls for text in texts]
+    assert len(embedded_after) == 2
+    assert not set(embedded_before) & set(embedded_after)
+    assert rag.load_vectorstore()._collection.count() == 4
+    with open(rag.manifest_path, encoding="utf-8") as f:
+        assert len(json.load(f)["files"]) == 4
+
+
+def test_manifest_is_not_rewritten_per_batch(make_rag, write_docs, monkeypatch):
+    docs = write_docs(_files(10))
+    saves = []
+    save_manifest = MultiDocumentRAG._save_manifest
+    monkeypatch.setattr(
+        MultiDocumentRAG, "_save_manifest",
+        lambda self, manifest: (saves.append(len(manifest["files"])), save_manifest(self, manifest))
+    )
+
+    make_rag().create_vectorstore(directory_path=str(docs), batch_size=1)
+
+    # One save before ingesting (removals) and one at the end, not one per batch
+    assert saves == [0, 10]
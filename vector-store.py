@@ -1,48 +1,43 @@
 from dotenv import load_dotenv
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
-# Import your models
-from multi_doc_rag import MultiDocumentRAG
+from clients import create_rag_system, get_llm_model
 
 load_dotenv()
 
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings  
-
-### embedding model
-embed_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-
-# Initialize components
-rag_system = MultiDocumentRAG(
-    embed_model=embed_model,
-    chroma_path="C:/Users/noeln/OneDrive/Desktop/Agentic RAG/generate-personalised-rm-proposals/my_documents_db",
-    chunk_size=500,
-    chunk_overlap=50
-)
-
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    temperature=0
-)
-
-# Step 1: Create vector store (run once)
-print("=" * 80)
-print("STEP 1: Loading Documents")
-print("=" * 80)
-
-# Option A: Load from directory
-rag_system.create_vectorstore(directory_path="C:/Users/noeln/OneDrive/Desktop/Agentic RAG/generate-personalised-rm-proposals/my_documents")
-
-# Option B: Load specific files
-# rag_system.create_vectorstore(document_paths=[
-#     "./documents/annual_report.pdf",
-#     "./documents/financial_data.xlsx",
-#     "./documents/meeting_notes.docx",
-#     "./documents/customer_feedback.csv"
-# ])
+CHROMA_PATH = "C:/Users/noeln/OneDrive/Desktop/Agentic RAG/generate-personalised-rm-proposals/my_documents_db"
+DOCUMENTS_PATH = "C:/Users/noeln/OneDrive/Desktop/Agentic RAG/generate-personalised-rm-proposals/my_documents"
+
+
+def main():
+    # Clients are built here rather than at import time (see clients.py)
+    rag_system = create_rag_system(chroma_path=CHROMA_PATH)
+    llm = get_llm_model()
+
+    # Step 1: Create vector store (run once)
+    print("=" * 80)
+    print("STEP 1: Loading Documents")
+    print("=" * 80)
+
+    # Option A: Load from directory
+    rag_system.create_vectorstore(directory_path=DOCUMENTS_PATH)
+
+    # Option B: Load specific files
+    # rag_system.create_vectorstore(document_paths=[
+    #     "./documents/annual_report.pdf",
+    #     "./documents/financial_data.xlsx",
+    #     "./documents/meeting_notes.docx",
+    #     "./documents/customer_feedback.csv"
+    # ])
+
+    return rag_system, llm
+
+
+if __name__ == "__main__":
+    rag_system, llm = main()
 
 
 """